@@ -1,15 +1,18 @@
 import os
-import sqlite3
 from datetime import datetime
 import logging
 import pytz
-import base64
-import aiohttp
 import asyncio
+import argparse
 from PIL import Image
 import glob
 import json
-import getpass
+import time
+from concurrent.futures import ProcessPoolExecutor
+from llm_client import LLMClient
+from database import migrate, bump_data_version, screenshots_done_by_all, SharedConnection
+from telemetry import record_stage_usage, stage_name
+from image_prep import ImageSettings, encode_image
 
 # Set up logging
 logging.basicConfig(
@@ -21,78 +24,83 @@ logging.basicConfig(
     ]
 )
 
+def prepare_screenshot(image_path, settings=ImageSettings()):
+    """Crop the screenshot to its right-hand column and encode it for upload, all in memory.
+
+    Module-level so the backlog's process pool can run it.
+    """
+    with Image.open(image_path) as img:
+        width, height = img.size
+        
+        # Calculate coordinates for cropping
+        # Start from right side (width - 800) and 180px from top
+        left = max(0, width - 800)  # Ensure we don't go negative
+        top = 180
+        right = width
+        bottom = height  # Keep full height after top crop
+        
+        cropped = img.crop((left, top, right, bottom))
+        return encode_image(cropped, settings)
+
+def parse_screenshot_timestamp(path):
+    """Capture time from a timeline_YYYYMMDD.png or timeline_YYYYMMDD_HHMMSS.png filename, or None"""
+    filename = os.path.basename(path)
+    parts = os.path.splitext(filename)[0].split('_')
+    if len(parts) < 2:
+        return None
+    timestamp_str = ''.join(parts[1:])
+    try:
+        if len(timestamp_str) == 8:  # YYYYMMDD format
+            timestamp = datetime.strptime(timestamp_str, '%Y%m%d')
+        else:  # YYYYMMDD_HHMMSS format
+            timestamp = datetime.strptime(timestamp_str, '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+    return pytz.UTC.localize(timestamp)
+
 class ScreenshotAnalyzer:
-    def __init__(self):
+    def __init__(self, client=None, db=None, backlog=True):
         self.DB_FILE = "twitter_data.db"
+        # Name the processed_screenshots marks are kept under
+        self.ANALYZER = stage_name(__file__)
+        # Analyze every pending screenshot instead of only the latest one
+        self.backlog = backlog
+        self.MAX_CONCURRENT_VISION_CALLS = 3
+        self.vision_slots = asyncio.Semaphore(self.MAX_CONCURRENT_VISION_CALLS)
+        # Seconds a claimed screenshot stays reserved before another run may retry it
+        self.LEASE_SECONDS = 600
+        # Failed analyses before a screenshot is left alone
+        self.MAX_ATTEMPTS = 3
         self.SCREENSHOTS_DIR = "screenshots"
-        self.PROCESSED_DIR = os.path.join(self.SCREENSHOTS_DIR, "processed")
-        self.API_KEY_FILE = "openai_key.txt"
+        # Upload encoding: 'JPEG' or 'WEBP' (or 'PNG' for lossless), and its quality
+        self.IMAGE_FORMAT = 'JPEG'
+        self.IMAGE_QUALITY = 85
+        # Optional caps on the upload's longest side and 512px vision tiles; by default
+        # images are only scaled down to the size the model would rescale them to anyway
+        self.MAX_IMAGE_DIMENSION = None
+        self.MAX_IMAGE_TILES = None
+        self.image_settings = ImageSettings(self.IMAGE_FORMAT, self.IMAGE_QUALITY,
+                                            self.MAX_IMAGE_DIMENSION, self.MAX_IMAGE_TILES)
         
         # Ensure directories exist
-        for directory in [self.SCREENSHOTS_DIR, self.PROCESSED_DIR]:
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-                logging.info(f"Created directory: {directory}")
-        
-        self.api_key = self.get_api_key()
-        self.init_database()
-
-    def get_api_key(self):
-        """Get OpenAI API key from file or user input"""
-        if os.path.exists(self.API_KEY_FILE):
-            try:
-                with open(self.API_KEY_FILE, 'r') as f:
-                    key = f.read().strip()
-                if key:
-                    logging.info("API key loaded from file")
-                    return key
-            except Exception as e:
-                logging.error(f"Error reading API key file: {e}")
-        
-        print("\nOpenAI API key not found or invalid.")
-        key = input("Please enter your OpenAI API key: ").strip()
-        
-        try:
-            with open(self.API_KEY_FILE, 'w') as f:
-                f.write(key)
-            logging.info("API key saved to file")
-        except Exception as e:
-            logging.error(f"Error saving API key: {e}")
+        if not os.path.exists(self.SCREENSHOTS_DIR):
+            os.makedirs(self.SCREENSHOTS_DIR)
+            logging.info(f"Created directory: {self.SCREENSHOTS_DIR}")
         
-        return key
+        self.client = client or LLMClient()
+        # Counters before this run, since the orchestrator shares one client across stages
+        self.usage_baseline = self.client.usage_stats()
+        # A shared connection comes from the orchestrator, which migrates once at startup
+        if db is None:
+            self.init_database()
+        self.db = db or SharedConnection(self.DB_FILE)
+        # Run counters reported to pipeline_runs
+        self.screenshots_processed = 0
+        self.screenshots_failed = 0
 
     def init_database(self):
-        """Initialize database with tables for trends and recommendations"""
-        conn = sqlite3.connect(self.DB_FILE)
-        c = conn.cursor()
-        
-        # Table for trending topics
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS trending_topics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                topic TEXT,
-                category TEXT,
-                tweet_volume INTEGER,
-                timestamp DATETIME,
-                screenshot_ref TEXT
-            )
-        ''')
-        
-        # Table for who to follow recommendations
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS follow_recommendations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT,
-                display_name TEXT,
-                description TEXT,
-                timestamp DATETIME,
-                screenshot_ref TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logging.info("Database tables initialized successfully")
+        """Bring the database schema, including trends and recommendations tables, up to date"""
+        migrate(self.DB_FILE)
 
     def get_latest_screenshot(self):
         """Get the most recent screenshot from the screenshots directory"""
@@ -105,37 +113,6 @@ class ScreenshotAnalyzer:
         logging.info(f"Found latest screenshot: {latest_screenshot}")
         return latest_screenshot
 
-    def crop_image(self, image_path):
-        """Crop the screenshot to 1260x1600 pixels"""
-        try:
-            img = Image.open(image_path)
-            width, height = img.size
-            
-            # Calculate coordinates for cropping
-            # Start from right side (width - 800) and 180px from top
-            left = max(0, width - 800)  # Ensure we don't go negative
-            top = 180
-            right = width
-            bottom = height  # Keep full height after top crop
-            
-            cropped = img.crop((left, top, right, bottom))
-            
-            filename = os.path.basename(image_path)
-            processed_path = os.path.join(self.PROCESSED_DIR, f"processed_{filename}")
-            
-            cropped.save(processed_path)
-            logging.info(f"Image cropped and saved: {processed_path}")
-            logging.info(f"Cropped dimensions: {cropped.size}")
-            return processed_path
-        except Exception as e:
-            logging.error(f"Error processing image: {e}")
-            return None
-
-    def encode_image(self, image_path):
-        """Encode image to base64"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-
     async def extract_json_from_response(self, content):
         """Extract and validate JSON from LLM response"""
         logging.info("Processing LLM response to extract JSON")
@@ -206,10 +183,8 @@ class ScreenshotAnalyzer:
             logging.error(f"Error extracting JSON: {e}")
             return None
 
-    async def analyze_image(self, image_path):
-        """Analyze image using GPT-4 Vision to extract trends and recommendations"""
-        image_base64 = self.encode_image(image_path)
-        
+    async def analyze_image(self, image):
+        """Analyze an EncodedImage using GPT-4 Vision to extract trends and recommendations"""
         prompt = """
         Analyze this Twitter/X screenshot and extract two types of information:
         1. Trending topics from the "Trends for you" section on the right
@@ -235,210 +210,318 @@ class ScreenshotAnalyzer:
         """
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
+            result = await self.client.chat_completion(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a JSON-only response bot. You must only return valid JSON without any additional text, markdown, or formatting."
                     },
-                    json={
-                        "model": "gpt-4o-mini",  # Updated to correct model name
-                        "messages": [
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
                             {
-                                "role": "system",
-                                "content": "You are a JSON-only response bot. You must only return valid JSON without any additional text, markdown, or formatting."
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "text", "text": prompt},
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/jpeg;base64,{image_base64}"
-                                        }
-                                    }
-                                ]
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:{image.mime_type};base64,{image.data}"
+                                }
                             }
-                        ],
-                        "max_tokens": 1000,
-                        "response_format": { "type": "json_object" }
+                        ]
                     }
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        try:
-                            content = result['choices'][0]['message']['content']
-                            # Use the enhanced JSON extraction method
-                            data = await self.extract_json_from_response(content)
-                            
-                            if data:
-                                # Clean and normalize the data
-                                cleaned_data = {
-                                    "trends": [],
-                                    "recommendations": []
-                                }
-                                
-                                # Clean trends
-                                for trend in data.get('trends', []):
-                                    cleaned_trend = {
-                                        "topic": str(trend.get('topic', '')).strip(),
-                                        "category": str(trend.get('category', '')).strip() or None,
-                                        "tweet_volume": int(trend['tweet_volume']) if trend.get('tweet_volume') and str(trend['tweet_volume']).isdigit() else None
-                                    }
-                                    cleaned_data['trends'].append(cleaned_trend)
-                                
-                                # Clean recommendations
-                                for rec in data.get('recommendations', []):
-                                    cleaned_rec = {
-                                        "username": str(rec.get('username', '')).strip().strip('@'),
-                                        "display_name": str(rec.get('display_name', '')).strip(),
-                                        "description": str(rec.get('description', '')).strip()
-                                    }
-                                    if cleaned_rec['username'] and cleaned_rec['display_name']:
-                                        cleaned_data['recommendations'].append(cleaned_rec)
-                                
-                                return cleaned_data
-                            return None
-                            
-                        except Exception as e:
-                            logging.error(f"Error processing GPT response: {e}")
-                            return None
-                            
-                    elif response.status == 401:
-                        logging.error("Invalid API key. Please provide a valid key.")
-                        if os.path.exists(self.API_KEY_FILE):
-                            os.remove(self.API_KEY_FILE)
-                        self.api_key = self.get_api_key()
-                        return await self.analyze_image(image_path)
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"OpenAI API error: {error_text}")
-                        return None
-                        
+                ],
+                max_tokens=1000,
+                response_format={ "type": "json_object" }
+            )
+            if not result:
+                return None
         except Exception as e:
             logging.error(f"Error calling OpenAI API: {e}")
             return None
 
-    def save_to_database(self, data, screenshot_ref, timestamp):
-        """Save the extracted data to the database"""
-        conn = sqlite3.connect(self.DB_FILE)
-        c = conn.cursor()
-        
         try:
-            # Save trending topics
-            for trend in data.get('trends', []):
-                c.execute('''
+            content = result['choices'][0]['message']['content']
+            # Use the enhanced JSON extraction method
+            data = await self.extract_json_from_response(content)
+            
+            if data:
+                # Clean and normalize the data
+                cleaned_data = {
+                    "trends": [],
+                    "recommendations": []
+                }
+                
+                # Clean trends
+                for trend in data.get('trends', []):
+                    cleaned_trend = {
+                        "topic": str(trend.get('topic', '')).strip(),
+                        "category": str(trend.get('category', '')).strip() or None,
+                        "tweet_volume": int(trend['tweet_volume']) if trend.get('tweet_volume') and str(trend['tweet_volume']).isdigit() else None
+                    }
+                    cleaned_data['trends'].append(cleaned_trend)
+                
+                # Clean recommendations
+                for rec in data.get('recommendations', []):
+                    cleaned_rec = {
+                        "username": str(rec.get('username', '')).strip().strip('@'),
+                        "display_name": str(rec.get('display_name', '')).strip(),
+                        "description": str(rec.get('description', '')).strip()
+                    }
+                    if cleaned_rec['username'] and cleaned_rec['display_name']:
+                        cleaned_data['recommendations'].append(cleaned_rec)
+                
+                return cleaned_data
+            return None
+            
+        except Exception as e:
+            logging.error(f"Error processing GPT response: {e}")
+            return None
+
+    def save_to_database(self, data, screenshot_ref, timestamp, screenshot=None):
+        """Save the extracted data to the database in one bulk transaction, returning whether it was saved.
+
+        A claimed ``screenshot`` is marked done in the same transaction, so its
+        data can never be saved twice.
+        """
+        try:
+            with self.db.transaction() as c:
+                # Save trending topics
+                c.executemany('''
                     INSERT INTO trending_topics 
                     (topic, category, tweet_volume, timestamp, screenshot_ref)
                     VALUES (?, ?, ?, ?, ?)
-                ''', (
+                ''', [(
                     trend['topic'],
                     trend.get('category'),
                     trend.get('tweet_volume'),
                     timestamp,
                     screenshot_ref
-                ))
-            
-            # Save follow recommendations
-            for rec in data.get('recommendations', []):
-                c.execute('''
+                ) for trend in data.get('trends', [])])
+                
+                # Save follow recommendations
+                c.executemany('''
                     INSERT INTO follow_recommendations 
                     (username, display_name, description, timestamp, screenshot_ref)
                     VALUES (?, ?, ?, ?, ?)
-                ''', (
+                ''', [(
                     rec['username'],
                     rec['display_name'],
                     rec['description'],
                     timestamp,
                     screenshot_ref
-                ))
+                ) for rec in data.get('recommendations', [])])
+                
+                if screenshot:
+                    c.execute('''
+                        UPDATE processed_screenshots
+                        SET status = 'done', processed_at = ?, lease_expires_at = NULL
+                        WHERE screenshot = ? AND analyzer = ?
+                    ''', (time.time(), screenshot, self.ANALYZER))
+                
+                bump_data_version(c)
             
-            conn.commit()
             logging.info("Data saved to database successfully")
+            return True
             
         except Exception as e:
             logging.error(f"Database error: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            return False
 
     def cleanup(self, original_screenshot):
-        """Delete the original screenshot file"""
+        """Delete the original screenshot file once every screenshot analyzer has marked it done"""
+        filename = os.path.basename(original_screenshot)
         try:
+            with self.db.transaction(immediate=False) as cursor:
+                if filename not in screenshots_done_by_all(cursor, [filename]):
+                    logging.info(f"Keeping {filename} until the other screenshot analyzers are done")
+                    return
             os.remove(original_screenshot)
             logging.info(f"Deleted original screenshot: {original_screenshot}")
+        except FileNotFoundError:
+            # The other analyzer finished at the same time and deleted it first
+            pass
         except Exception as e:
             logging.error(f"Error deleting original screenshot: {e}")
 
-    async def process(self):
-        """Main processing function"""
+    def get_pending_screenshots(self):
+        """Every screenshot this analyzer has not finished, oldest first.
+
+        Screenshots this analyzer already marked done are skipped, and
+        deleted if every screenshot analyzer is done with them (a crash can
+        leave one behind between the commit and the delete); ones that kept
+        failing are left in place and skipped.
+        """
+        screenshots = {os.path.basename(path): path
+                       for path in glob.glob(os.path.join(self.SCREENSHOTS_DIR, "timeline_*.png"))}
+        if not screenshots:
+            logging.info("No screenshots found")
+            return []
+        
+        with self.db.transaction(immediate=False) as cursor:
+            placeholders = ','.join('?' * len(screenshots))
+            cursor.execute(f'''
+                SELECT screenshot, status
+                FROM processed_screenshots
+                WHERE analyzer = ? AND status IN ('done', 'failed') AND screenshot IN ({placeholders})
+            ''', [self.ANALYZER] + list(screenshots))
+            finished = dict(cursor.fetchall())
+        
+        for name, status in finished.items():
+            if status == 'done':
+                self.cleanup(screenshots[name])
+        pending = [path for name, path in screenshots.items() if name not in finished]
+        logging.info(f"Found {len(pending)} pending screenshots")
+        return sorted(pending, key=lambda path: (parse_screenshot_timestamp(path) or datetime.max.replace(tzinfo=pytz.UTC),
+                                                 os.path.basename(path)))
+
+    def claim_screenshot(self, screenshot):
+        """Lease a screenshot to this run; False if it is done, failed or leased elsewhere"""
+        now = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO processed_screenshots (screenshot, analyzer, status, attempts, lease_expires_at)
+                VALUES (?, ?, 'claimed', 1, ?)
+                ON CONFLICT (screenshot, analyzer) DO UPDATE SET
+                    status = 'claimed',
+                    attempts = attempts + 1,
+                    lease_expires_at = excluded.lease_expires_at
+                WHERE status = 'pending' OR (status = 'claimed' AND lease_expires_at < ?)
+            ''', (screenshot, self.ANALYZER, now + self.LEASE_SECONDS, now))
+            return cursor.rowcount == 1
+
+    def release_screenshot(self, screenshot):
+        """Give up a claim after a failure, retiring screenshots that hit MAX_ATTEMPTS"""
         try:
-            # Get latest screenshot
-            original_screenshot = self.get_latest_screenshot()
-            if not original_screenshot:
-                logging.info("No screenshots to process")
-                return
-            
-            # Extract timestamp from filename
-            try:
-                # Get just the filename without path
-                filename = os.path.basename(original_screenshot)
-                # Log the filename for debugging
-                logging.info(f"Processing file: {filename}")
-                
-                # Extract timestamp part more carefully
-                # Handle both formats: timeline_YYYYMMDD_HHMMSS.png and timeline_YYYYMMDD.png
-                parts = filename.split('_')
-                if len(parts) >= 2:
-                    timestamp_str = parts[1].split('.')[0]
-                    if len(timestamp_str) == 8:  # YYYYMMDD format
-                        timestamp = datetime.strptime(timestamp_str, '%Y%m%d')
-                    else:  # YYYYMMDD_HHMMSS format
-                        timestamp = datetime.strptime(timestamp_str, '%Y%m%d%H%M%S')
-                else:
-                    raise ValueError(f"Unexpected filename format: {filename}")
-                
-                timestamp = pytz.UTC.localize(timestamp)
-                logging.info(f"Extracted timestamp: {timestamp}")
-            
-            except Exception as e:
-                logging.error(f"Error parsing timestamp from filename: {e}")
+            with self.db.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE processed_screenshots
+                    SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        lease_expires_at = NULL
+                    WHERE screenshot = ? AND analyzer = ? AND status = 'claimed'
+                ''', (self.MAX_ATTEMPTS, screenshot, self.ANALYZER))
+        except Exception as e:
+            logging.error(f"Error releasing screenshot {screenshot}: {e}")
+
+    async def process_screenshot(self, original_screenshot, pool=None):
+        """Claim, crop, analyze and save one screenshot, deleting it once every analyzer has saved its data"""
+        filename = os.path.basename(original_screenshot)
+        if not await asyncio.to_thread(self.claim_screenshot, filename):
+            logging.info(f"Skipping {filename}: already analyzed or claimed by another run")
+            return
+        
+        saved = False
+        try:
+            logging.info(f"Processing file: {filename}")
+            timestamp = parse_screenshot_timestamp(original_screenshot)
+            if timestamp is None:
                 # Use current time as fallback
                 timestamp = datetime.now(pytz.UTC)
-                logging.info(f"Using current time instead: {timestamp}")
+                logging.info(f"Could not parse a timestamp from {filename}, using current time instead: {timestamp}")
+            else:
+                logging.info(f"Extracted timestamp: {timestamp}")
             
-            # Crop image
-            processed_image = self.crop_image(original_screenshot)
-            if not processed_image:
+            # Decoding, cropping and encoding are CPU-bound: a process pool for backlogs, a thread otherwise
+            try:
+                image = await asyncio.get_running_loop().run_in_executor(
+                    pool, prepare_screenshot, original_screenshot, self.image_settings
+                )
+            except Exception as e:
+                logging.error(f"Error processing image: {e}")
+                self.screenshots_failed += 1
                 return
+            logging.info(f"Prepared {filename}: {image.width}x{image.height} {image.mime_type}, {image.size} bytes")
             
             # Analyze image
-            data = await self.analyze_image(processed_image)
+            async with self.vision_slots:
+                data = await self.analyze_image(image)
             if data:
                 # Print the extracted data for verification
                 logging.info("Extracted data:")
                 print(json.dumps(data, indent=2))
                 
-                # Save to database
-                self.save_to_database(
-                    data, 
-                    os.path.basename(processed_image),
-                    timestamp.isoformat()
+                # Save to database, marking the screenshot done in the same transaction
+                saved = await asyncio.to_thread(
+                    self.save_to_database,
+                    data,
+                    filename,
+                    timestamp.isoformat(),
+                    filename
                 )
-                
-                # Cleanup original screenshot
-                self.cleanup(original_screenshot)
-                
-            logging.info("Processing completed successfully")
+            
+            if saved:
+                # Cleanup original screenshot, unless another analyzer still needs it
+                await asyncio.to_thread(self.cleanup, original_screenshot)
+                self.screenshots_processed += 1
+            else:
+                self.screenshots_failed += 1
+        
+        except Exception as e:
+            logging.error(f"Error in processing {filename}: {e}")
+            self.screenshots_failed += 1
+        finally:
+            if not saved:
+                await asyncio.to_thread(self.release_screenshot, filename)
+
+    async def process(self):
+        """Main processing function: the whole backlog oldest first, or only the latest screenshot"""
+        try:
+            if self.backlog:
+                screenshots = self.get_pending_screenshots()
+            else:
+                latest = self.get_latest_screenshot()
+                screenshots = [latest] if latest else []
+            if not screenshots:
+                logging.info("No screenshots to process")
+                return
+            
+            # Twice as many workers as vision slots, so the next crops overlap the calls in flight
+            workers = min(len(screenshots), 2 * self.MAX_CONCURRENT_VISION_CALLS)
+            pool = ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1)) if workers > 1 else None
+            queue = iter(screenshots)
+            
+            async def worker():
+                # Workers share the iterator, so screenshots are started in timestamp order
+                for screenshot in queue:
+                    await self.process_screenshot(screenshot, pool)
+            
+            try:
+                await asyncio.gather(*(worker() for _ in range(workers)))
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+            
+            logging.info(f"Processing completed: {self.screenshots_processed} screenshots analyzed, "
+                         f"{self.screenshots_failed} failed")
             
         except Exception as e:
             logging.error(f"Error in processing: {e}")
+            self.screenshots_failed += 1
+
+    def telemetry_counters(self):
+        """Counters for this stage's pipeline_runs row"""
+        counters = self.client.usage_since(self.usage_baseline)
+        counters['items_processed'] = self.screenshots_processed
+        counters['failures'] = self.screenshots_failed
+        return counters
+
+async def main(client=None, db=None, run_id=None, backlog=True):
+    """Analyze the pending screenshots, or only the latest one without ``backlog``.
 
-async def main():
-    analyzer = ScreenshotAnalyzer()
-    await analyzer.process()
+    The in-process orchestrator passes its shared client and connection,
+    which are left open, and the id of the pipeline run.
+    """
+    analyzer = ScreenshotAnalyzer(client=client, db=db, backlog=backlog)
+    try:
+        await analyzer.process()
+    finally:
+        record_stage_usage(analyzer.db, analyzer.telemetry_counters(), run_id, stage_name(__file__))
+        if client is None:
+            await analyzer.client.close()
+        if db is None:
+            analyzer.db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Extract trends and recommendations from timeline screenshots")
+    parser.add_argument('--latest-only', action='store_true',
+                        help="Analyze only the newest screenshot instead of the whole backlog")
+    args = parser.parse_args()
+    asyncio.run(main(backlog=not args.latest_only))
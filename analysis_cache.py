@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import re
+import time
+from database import migrate, SharedConnection
+
+RETWEET_PREFIX = re.compile(r'^rt @\w+:\s*')
+WHITESPACE = re.compile(r'\s+')
+
+
+class AnalysisCache:
+    """Persistent cache of tweet analyses keyed on a hash of the normalized text.
+
+    Entries are evicted least-recently-used first once the table grows past
+    ``max_entries``. The table is only counted every ``evict_every`` stored
+    rows, so it may briefly run that far over.
+    """
+
+    def __init__(self, db_file="twitter_data.db", max_entries=50000, db=None, evict_every=1000):
+        self.DB_FILE = db_file
+        self.MAX_ENTRIES = max_entries
+        self.EVICT_EVERY = evict_every
+        self.stored_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        # A connection handed in belongs to an owner that has already migrated
+        if db is None:
+            self.init_database()
+        self.db = db or SharedConnection(db_file)
+
+    def init_database(self):
+        """Make sure the cache table exists"""
+        migrate(self.DB_FILE)
+
+    @staticmethod
+    def normalize_text(text):
+        """Normalize tweet text so retweets and whitespace variants share a key"""
+        text = (text or '').strip().lower()
+        text = RETWEET_PREFIX.sub('', text)
+        return WHITESPACE.sub(' ', text)
+
+    def text_hash(self, text):
+        """Hash of the normalized tweet text"""
+        return hashlib.sha256(self.normalize_text(text).encode('utf-8')).hexdigest()
+
+    def lookup(self, tweets):
+        """Split tweets into cached analyses and tweets that still need the model"""
+        hashes = {tweet_id: self.text_hash(tweet['text']) for tweet_id, tweet in tweets}
+        unique_hashes = list(set(hashes.values()))
+        if not unique_hashes:
+            return [], []
+
+        with self.db.transaction() as cursor:
+            placeholders = ','.join('?' * len(unique_hashes))
+            cursor.execute(f'''
+                SELECT text_hash, summary, sentiment, category
+                FROM analysis_cache
+                WHERE text_hash IN ({placeholders})
+            ''', unique_hashes)
+            found = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            if found:
+                cursor.executemany('''
+                    UPDATE analysis_cache
+                    SET last_used_at = ?, hit_count = hit_count + 1
+                    WHERE text_hash = ?
+                ''', [(time.time(), text_hash) for text_hash in found])
+
+        cached_results = []
+        uncached = []
+        for tweet_id, tweet in tweets:
+            entry = found.get(hashes[tweet_id])
+            if entry:
+                summary, sentiment, category = entry
+                cached_results.append({
+                    'id': tweet_id,
+                    'summary': summary,
+                    'sentiment': sentiment,
+                    'category': category
+                })
+            else:
+                uncached.append((tweet_id, tweet))
+
+        self.hits += len(cached_results)
+        self.misses += len(uncached)
+        return cached_results, uncached
+
+    def store(self, tweets, analyses):
+        """Cache complete analyses for the given batch of tweets"""
+        texts = {str(tweet_id): tweet['text'] for tweet_id, tweet in tweets}
+        now = time.time()
+        rows = []
+        for result in analyses:
+            text = texts.get(str(result.get('id')))
+            if text is None or not all(key in result for key in ['summary', 'sentiment', 'category']):
+                continue
+            rows.append((
+                self.text_hash(text),
+                result['summary'],
+                result['sentiment'],
+                result['category'],
+                now,
+                now
+            ))
+        if not rows:
+            return
+
+        self.stored_since_evict += len(rows)
+        try:
+            with self.db.transaction() as cursor:
+                # Upsert, so an entry stored again keeps its creation time and usage counters
+                cursor.executemany('''
+                    INSERT INTO analysis_cache
+                    (text_hash, summary, sentiment, category, created_at, last_used_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (text_hash) DO UPDATE SET
+                        summary = excluded.summary,
+                        sentiment = excluded.sentiment,
+                        category = excluded.category
+                ''', rows)
+                if self.stored_since_evict >= self.EVICT_EVERY:
+                    self.evict(cursor)
+                    self.stored_since_evict = 0
+        except Exception as e:
+            logging.error(f"Error storing analysis cache entries: {e}")
+
+    def evict(self, cursor):
+        """Drop the least recently used entries beyond MAX_ENTRIES"""
+        cursor.execute('SELECT COUNT(*) FROM analysis_cache')
+        excess = cursor.fetchone()[0] - self.MAX_ENTRIES
+        if excess > 0:
+            cursor.execute('''
+                DELETE FROM analysis_cache
+                WHERE text_hash IN (
+                    SELECT text_hash FROM analysis_cache
+                    ORDER BY last_used_at
+                    LIMIT ?
+                )
+            ''', (excess,))
+            logging.info(f"Evicted {excess} analysis cache entries")
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def log_stats(self):
+        """Log hit/miss counters"""
+        logging.info(f"Analysis cache: {self.hits} hits, {self.misses} misses "
+                     f"({self.hit_rate():.1%} hit rate)")
@@ -0,0 +1,174 @@
+"""Compare rows/sec of the old per-row write loop with the bulk write paths.
+
+The current paths call TweetAnalyzer.save_analysis and
+ScreenshotAnalyzer.save_to_database themselves, so their timings include
+the processed-row check, the timeline rollups and the data version bump.
+Run from the repository root:
+
+    python benchmarks/bench_bulk_writes.py [rows ...]
+"""
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import migrate, SharedConnection
+from llm_client import LLMClient
+
+BATCH_SIZE = 25
+UPDATE_SQL = '''
+    UPDATE tweets
+    SET processed = TRUE, processed_at = ?, summary = ?, sentiment = ?, category = ?
+    WHERE tweet_id = ?
+'''
+INSERT_TREND_SQL = '''
+    INSERT INTO trending_topics (topic, category, tweet_volume, timestamp, screenshot_ref)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def create_database(path, rows):
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO tweets (tweet_id, author, text, timestamp, url) VALUES (?, ?, ?, ?, ?)',
+        [(str(i), f"author{i % 500}", f"tweet text {i}", '2024-01-01T00:00:00', '')
+         for i in range(rows)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def analysis_rows(rows):
+    return [('2024-01-02T00:00:00', f"summary {i}", 'neutral', 'opinion', str(i)) for i in range(rows)]
+
+
+def batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def per_row_loop(path, rows):
+    """Previous save_analysis: new connection per batch, one UPDATE per tweet"""
+    for batch in batches(rows, BATCH_SIZE):
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        for row in batch:
+            cursor.execute(UPDATE_SQL, row)
+        conn.commit()
+        conn.close()
+
+
+def save_analysis(path, rows):
+    """Current TweetAnalyzer.save_analysis, one call per batch on a shared connection"""
+    from tweet_analyzer import TweetAnalyzer
+    db = SharedConnection(path)
+    analyzer = TweetAnalyzer(client=LLMClient(api_key='benchmark-key'), db=db)
+    for batch in batches(rows, BATCH_SIZE):
+        analyzer.save_analysis({'analyses': [
+            {'id': tweet_id, 'summary': summary, 'sentiment': sentiment, 'category': category}
+            for _, summary, sentiment, category, tweet_id in batch
+        ]})
+    db.close()
+
+
+def executemany_single(path, rows):
+    """All rows in one executemany transaction"""
+    db = SharedConnection(path)
+    with db.transaction() as cursor:
+        cursor.executemany(UPDATE_SQL, rows)
+    db.close()
+
+
+def temp_table_join(path, rows):
+    """Load a temp table and apply it with one UPDATE ... FROM (SQLite 3.33+)"""
+    db = SharedConnection(path)
+    with db.transaction() as cursor:
+        cursor.execute('''
+            CREATE TEMP TABLE analysis_batch (
+                processed_at TEXT, summary TEXT, sentiment TEXT, category TEXT,
+                tweet_id TEXT PRIMARY KEY
+            )
+        ''')
+        cursor.executemany('INSERT INTO analysis_batch VALUES (?, ?, ?, ?, ?)', rows)
+        cursor.execute('''
+            UPDATE tweets
+            SET processed = TRUE,
+                processed_at = b.processed_at,
+                summary = b.summary,
+                sentiment = b.sentiment,
+                category = b.category
+            FROM analysis_batch AS b
+            WHERE tweets.tweet_id = b.tweet_id
+        ''')
+        cursor.execute('DROP TABLE analysis_batch')
+    db.close()
+
+
+def trend_rows(rows):
+    return [(f"topic {i}", 'Trending', i, '2024-01-01T00:00:00', 'shot.png') for i in range(rows)]
+
+
+def insert_per_row(path, rows):
+    """Previous save_to_database: one INSERT per trend"""
+    for batch in batches(rows, BATCH_SIZE):
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        for row in batch:
+            cursor.execute(INSERT_TREND_SQL, row)
+        conn.commit()
+        conn.close()
+
+
+def save_to_database(path, rows):
+    """Current ScreenshotAnalyzer.save_to_database, one call per screenshot on a shared connection"""
+    from screenshots_analyze import ScreenshotAnalyzer
+    db = SharedConnection(path)
+    analyzer = ScreenshotAnalyzer(client=LLMClient(api_key='benchmark-key'), db=db)
+    for batch in batches(rows, BATCH_SIZE):
+        trends = [{'topic': topic, 'category': category, 'tweet_volume': volume}
+                  for topic, category, volume, _, _ in batch]
+        analyzer.save_to_database({'trends': trends, 'recommendations': []}, batch[0][4], batch[0][3])
+    db.close()
+
+
+def run(name, strategy, rows, make_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        create_database(path, rows)
+        data = make_rows(rows)
+        start = time.perf_counter()
+        strategy(path, data)
+        elapsed = time.perf_counter() - start
+    print(f"  {name:<40}{elapsed:>9.2f}s{rows / elapsed:>14,.0f} rows/s")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    if sqlite3.sqlite_version_info < (3, 33, 0):
+        print(f"SQLite {sqlite3.sqlite_version} has no UPDATE ... FROM, skipping temp-table join")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The analyzers create screenshots/ and their log files in the working directory
+        os.chdir(workdir)
+        logging.basicConfig(level=logging.INFO, handlers=[logging.FileHandler('benchmark.log')])
+
+        for rows in sizes:
+            print(f"\n{rows:,} rows (batches of {BATCH_SIZE} where applicable)")
+            print("save_analysis")
+            run("per-row loop (previous)", per_row_loop, rows, analysis_rows)
+            run("save_analysis per batch (current)", save_analysis, rows, analysis_rows)
+            run("executemany single transaction", executemany_single, rows, analysis_rows)
+            if sqlite3.sqlite_version_info >= (3, 33, 0):
+                run("temp table + UPDATE ... FROM", temp_table_join, rows, analysis_rows)
+            print("save_to_database")
+            run("per-row loop (previous)", insert_per_row, rows, trend_rows)
+            run("save_to_database per shot (current)", save_to_database, rows, trend_rows)
+
+
+if __name__ == '__main__':
+    main()
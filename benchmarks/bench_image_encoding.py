@@ -0,0 +1,132 @@
+"""Compare upload size, encode time and extraction accuracy across screenshot encodings.
+
+The baseline is what the analyzer used to upload: the full-resolution crop
+as PNG. Every other setting is cropped, resized and encoded in memory by
+image_prep. Without screenshots a synthetic timeline is drawn, which is
+enough for bytes and timings; --accuracy needs real screenshots and an API
+key, and scores each setting's extracted topics and usernames against the
+baseline's. Run from the repository root:
+
+    python benchmarks/bench_image_encoding.py [--accuracy] [screenshots ...]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from image_prep import ImageSettings, EncodedImage, vision_tiles
+from screenshots_analyze import ScreenshotAnalyzer, prepare_screenshot
+
+SETTINGS = [
+    ('JPEG q60', ImageSettings('JPEG', 60)),
+    ('JPEG q75', ImageSettings('JPEG', 75)),
+    ('JPEG q85 (default)', ImageSettings('JPEG', 85)),
+    ('JPEG q95', ImageSettings('JPEG', 95)),
+    ('WEBP q60', ImageSettings('WEBP', 60)),
+    ('WEBP q75', ImageSettings('WEBP', 75)),
+    ('WEBP q85', ImageSettings('WEBP', 85)),
+    ('JPEG q85, 768px', ImageSettings('JPEG', 85, max_dimension=768)),
+    ('JPEG q85, 4 tiles', ImageSettings('JPEG', 85, max_tiles=4)),
+    ('JPEG q85, 2 tiles', ImageSettings('JPEG', 85, max_tiles=2)),
+]
+
+
+def previous_upload(image_path):
+    """Previous pipeline: the full-resolution crop saved as PNG and read back"""
+    with Image.open(image_path) as img:
+        cropped = img.crop((0, 0, 1260, 1600))
+        buffer = io.BytesIO()
+        cropped.save(buffer, format='PNG')
+        data = buffer.getvalue()
+        return EncodedImage(base64.b64encode(data).decode('ascii'), 'image/png',
+                            cropped.width, cropped.height, len(data))
+
+
+def synthetic_screenshot(path):
+    """A timeline-like page: text on white, a sidebar and a few image blocks"""
+    img = Image.new('RGB', (1920, 1600), 'white')
+    draw = ImageDraw.Draw(img)
+    for row in range(60):
+        y = 20 + row * 26
+        draw.text((40, y), f"@user{row} Tweet text number {row} about topic #{row % 7}", fill='black')
+        draw.text((1300, y), f"Trending in Tech #{row} topic{row} {row * 1000} posts", fill=(83, 100, 113))
+    for block in range(4):
+        draw.rectangle((600, 100 + block * 350, 1200, 380 + block * 350),
+                       fill=(29 + block * 40, 155, 240 - block * 30))
+    img.save(path)
+
+
+def encode_all(paths, encode, repeats):
+    """Encode every screenshot, returning the images and the mean milliseconds per screenshot"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        images = [encode(path) for path in paths]
+    return images, (time.perf_counter() - start) / (repeats * len(paths)) * 1000
+
+
+def extracted(data):
+    data = data or {}
+    return ({trend['topic'].lower() for trend in data.get('trends', []) if trend.get('topic')},
+            {rec['username'].lower() for rec in data.get('recommendations', []) if rec.get('username')})
+
+
+def recall(found, expected):
+    return len(found & expected) / len(expected) if expected else 1.0
+
+
+async def analyze_all(analyzer, images):
+    try:
+        return [await analyzer.analyze_image(image) for image in images]
+    finally:
+        await analyzer.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('screenshots', nargs='*', help='timeline_*.png files to encode')
+    parser.add_argument('--accuracy', action='store_true',
+                        help='Call the vision model for every setting and score against the baseline')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = args.screenshots
+        if not paths:
+            if args.accuracy:
+                parser.error('--accuracy needs real screenshots')
+            paths = [os.path.join(workdir, 'timeline_synthetic.png')]
+            synthetic_screenshot(paths[0])
+
+        runs = [('previous PNG upload', previous_upload)]
+        runs += [(name, lambda path, settings=settings: prepare_screenshot(path, settings))
+                 for name, settings in SETTINGS]
+
+        analyzer = ScreenshotAnalyzer() if args.accuracy else None
+        baseline = None
+        print(f"\n{len(paths)} screenshot(s), {args.repeats} encodes each")
+        header = f"  {'setting':<22}{'dimensions':>12}{'bytes':>12}{'tiles':>7}{'encode':>11}"
+        print(header + (f"{'topics':>9}{'users':>8}" if args.accuracy else ''))
+        for name, encode in runs:
+            images, encode_ms = encode_all(paths, encode, args.repeats)
+            size = sum(image.size for image in images) / len(images)
+            tiles = sum(vision_tiles(image.width, image.height) for image in images) / len(images)
+            line = (f"  {name:<22}{f'{images[0].width}x{images[0].height}':>12}{size:>12,.0f}"
+                    f"{tiles:>7.1f}{encode_ms:>8.1f} ms")
+            if analyzer:
+                results = [extracted(data) for data in asyncio.run(analyze_all(analyzer, images))]
+                baseline = baseline or results
+                topics = sum(recall(found[0], expected[0]) for found, expected in zip(results, baseline))
+                users = sum(recall(found[1], expected[1]) for found, expected in zip(results, baseline))
+                line += f"{topics / len(paths):>9.0%}{users / len(paths):>8.0%}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Estimate how many LLM calls near-duplicate clustering saves on a synthetic corpus.
+
+Run from the repository root:
+
+    python benchmarks/bench_near_duplicates.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_cache import AnalysisCache
+from near_duplicates import NearDuplicateClusterer
+
+BATCH_SIZE = 25
+EMOJI = ['\U0001F621', '\U0001F525', '\U0001F602', '\U0001F44F', '\U0001F6A8', '']
+WORDS = ('market policy game team vote city school rain launch model court price '
+         'health music film border energy crypto league protest bank storm '
+         'election science space travel hospital strike transfer update court '
+         'report lawsuit tax budget festival release outage airline').split()
+
+
+def random_sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def build_corpus(rng, templates=60, copies=25, unique=1500):
+    """Templated bot floods plus unique organic tweets, each labelled with its source"""
+    corpus = []
+    for t in range(templates):
+        base = random_sentence(rng, rng.randint(12, 30))
+        for _ in range(rng.randint(copies // 2, copies)):
+            text = base
+            if rng.random() < 0.7:
+                text = f"@user{rng.randint(1, 10 ** 6)} {text}"
+            if rng.random() < 0.5:
+                text += f" https://t.co/{rng.randint(10 ** 6, 10 ** 7)}"
+            text += ' ' + rng.choice(EMOJI)
+            if rng.random() < 0.3:
+                text = text.upper()
+            corpus.append((f"template-{t}", text))
+    for u in range(unique):
+        corpus.append((f"unique-{u}", random_sentence(rng, rng.randint(8, 30))))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run_exact(corpus):
+    cache = AnalysisCache.normalize_text
+    seen = set()
+    sent = 0
+    for _, text in corpus:
+        key = cache(text)
+        if key not in seen:
+            seen.add(key)
+            sent += 1
+    return sent, 0
+
+
+def run_clustered(corpus, max_distance):
+    """Simulate the analyzer: cluster each batch, 'analyze' representatives, propagate labels"""
+    clusterer = NearDuplicateClusterer(max_distance=max_distance)
+    sources = {}
+    sent = 0
+    wrong = 0
+    tweets = [(str(i), {'text': text}) for i, (_, text) in enumerate(corpus)]
+    for i, (source, _) in enumerate(corpus):
+        sources[str(i)] = source
+
+    for batch in batches(tweets, BATCH_SIZE):
+        copied, representatives, followers = clusterer.cluster(batch)
+        sent += len(representatives)
+        # The fake model labels each tweet with its true source
+        analyses = [{'id': tweet_id, 'summary': '', 'sentiment': sources[tweet_id],
+                     'category': ''} for tweet_id, _ in representatives]
+        copied += clusterer.propagate(analyses, followers)
+        wrong += sum(1 for result in copied if result['sentiment'] != sources[str(result['id'])])
+    return sent, wrong
+
+
+def main():
+    rng = random.Random(42)
+    corpus = build_corpus(rng)
+    distinct_sources = len({source for source, _ in corpus})
+    baseline_calls = -(-len(corpus) // BATCH_SIZE)
+
+    print(f"Corpus: {len(corpus)} tweets, {distinct_sources} distinct sources")
+    print(f"{'strategy':<24}{'tweets sent':>12}{'LLM calls':>11}{'saved':>8}{'wrong labels':>14}{'time':>9}")
+    print(f"{'no dedup':<24}{len(corpus):>12}{baseline_calls:>11}{'0.0%':>8}{0:>14}{'-':>9}")
+
+    rows = [('exact hash', lambda: run_exact(corpus))]
+    for max_distance in (3, 6, 10, 14):
+        rows.append((f"simhash d<={max_distance}", lambda d=max_distance: run_clustered(corpus, d)))
+
+    for name, run in rows:
+        start = time.perf_counter()
+        sent, wrong = run()
+        elapsed = time.perf_counter() - start
+        calls = -(-sent // BATCH_SIZE)
+        saved = 1 - calls / baseline_calls
+        print(f"{name:<24}{sent:>12}{calls:>11}{saved:>8.1%}{wrong:>14}{elapsed:>8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare the fixed per-cycle cost of subprocess-per-stage runs with the in-process orchestrator.
+
+Every stage runs against an empty database with no screenshots, so the
+timings are pure overhead: interpreter startup, imports, the API key read,
+schema checks and connection setup. Run from the repository root:
+
+    python benchmarks/bench_orchestrator.py [cycles]
+"""
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+STAGES = ['Gettweets.py', 'screenshots_analyze.py', 'tweet_analyzer.py']
+
+
+def prepare(workdir):
+    """Empty, migrated database and a placeholder API key so no stage prompts"""
+    from database import migrate
+    migrate(os.path.join(workdir, 'twitter_data.db'))
+    with open(os.path.join(workdir, 'openai_key.txt'), 'w') as f:
+        f.write('benchmark-key')
+
+
+def subprocess_cycle(workdir):
+    """Previous start.py: a fresh interpreter per stage"""
+    for script in STAGES:
+        subprocess.run([sys.executable, os.path.join(REPO_ROOT, script)], cwd=workdir,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    print(f"  {name:<36}{sum(timings) / len(timings) * 1000:>10.1f} ms mean"
+          f"{timings[len(timings) // 2] * 1000:>10.1f} ms median")
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(workdir)
+        os.chdir(workdir)
+        # Stage logs go to a file in both modes, as they do in the child processes
+        logging.basicConfig(level=logging.INFO, handlers=[logging.FileHandler('benchmark.log')])
+
+        timings = []
+        for _ in range(cycles):
+            start = time.perf_counter()
+            subprocess_cycle(workdir)
+            timings.append(time.perf_counter() - start)
+        print(f"\n{cycles} cycles of {len(STAGES)} stages with nothing to do")
+        report("subprocess per stage", timings)
+
+        start = time.perf_counter()
+        from orchestrator import InProcessOrchestrator
+        from telemetry import stage_name
+        orchestrator = InProcessOrchestrator()
+        for script in STAGES:
+            orchestrator.stage_module(stage_name(script))
+        startup = time.perf_counter() - start
+
+        timings = []
+        for _ in range(cycles):
+            start = time.perf_counter()
+            for script in STAGES:
+                orchestrator.run_stage(script)
+            timings.append(time.perf_counter() - start)
+        orchestrator.close()
+        print(f"  {'in-process startup (once)':<36}{startup * 1000:>10.1f} ms")
+        report("in-process per cycle", timings)
+
+
+if __name__ == '__main__':
+    main()
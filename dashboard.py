@@ -1,173 +1,390 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, g
+from markupsafe import escape
 import sqlite3
 from datetime import datetime, timedelta
+import base64
+import calendar
+import functools
 import json
+import time
 import pytz
+from database import migrate, get_data_version, ReadOnlyConnectionPool, ROLLUP_BUCKETS, ROLLUP_TABLES
+from event_stream import EventBroadcaster
+from metrics import REGISTRY, Histogram, CallbackMetric, TimedConnection, SIZE_BUCKETS
+from response_cache import ResponseCache
 
 app = Flask(__name__)
 
+DB_FILE = 'twitter_data.db'
+# Readers in WAL mode don't wait on the pipeline's writes; the short busy
+# timeout only covers brief checkpoint locks. TimedConnection feeds the
+# per-statement latency histogram on /metrics
+db_pool = ReadOnlyConnectionPool(DB_FILE, row_factory=sqlite3.Row, busy_timeout_ms=1000,
+                                 factory=TimedConnection)
+
+class PooledConnection:
+    """Connection borrowed from db_pool; close() hands it back instead of closing it"""
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            db_pool.release(self._conn)
+            self._conn = None
+
+def date_to_epoch(date_str, days=0):
+    """UTC epoch seconds at the start of a YYYY-MM-DD date, shifted by whole days"""
+    day = datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)
+    return calendar.timegm(day.timetuple())
+
 def get_db_connection():
-    """Create a connection to Twitter database"""
-    conn = sqlite3.connect('twitter_data.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled read-only connection to the Twitter database"""
+    return PooledConnection(db_pool.acquire())
+
+@app.errorhandler(sqlite3.OperationalError)
+def handle_database_busy(error):
+    """Answer quickly with 503 instead of stalling when the database stays locked"""
+    message = str(error)
+    if 'locked' not in message and 'busy' not in message:
+        return jsonify({'error': message}), 500
+    response = jsonify({'error': 'Database busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+class InvalidArgument(ValueError):
+    """A query argument the API cannot use"""
+
+@app.errorhandler(InvalidArgument)
+def handle_invalid_argument(error):
+    """Report unusable query arguments as 400 Bad Request"""
+    return jsonify({'error': str(error)}), 400
+
+response_cache = ResponseCache()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'dashboard_request_duration_seconds',
+    'Time to produce a response, by route',
+    ['route', 'method', 'status']
+))
+RESPONSE_BYTES = REGISTRY.register(Histogram(
+    'dashboard_response_size_bytes',
+    'Size of response bodies, by route',
+    ['route'],
+    buckets=SIZE_BUCKETS
+))
+REGISTRY.register(CallbackMetric(
+    'dashboard_response_cache_requests_total',
+    'Cached endpoint requests by outcome; coalesced requests waited on an identical one',
+    'counter',
+    lambda: [({'result': 'hit'}, response_cache.hits),
+             ({'result': 'miss'}, response_cache.misses),
+             ({'result': 'coalesced'}, response_cache.coalesced)]
+))
+REGISTRY.register(CallbackMetric(
+    'dashboard_response_cache_hit_ratio',
+    'Fraction of cached endpoint requests served without running queries',
+    'gauge',
+    lambda: [({}, response_cache.hit_rate())]
+))
+REGISTRY.register(CallbackMetric(
+    'dashboard_response_cache_entries',
+    'Responses currently held in the response cache',
+    'gauge',
+    lambda: [({}, len(response_cache.entries))]
+))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record route latency and response size for /metrics"""
+    started = g.pop('request_started', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                method=request.method, status=response.status_code)
+    # Streamed responses (the SSE channel) have no length up front
+    if not response.is_streamed:
+        RESPONSE_BYTES.observe(response.calculate_content_length() or 0, route=route)
+    return response
+
+def current_data_version():
+    """Version number the pipeline bumps whenever it commits new data"""
+    conn = get_db_connection()
+    try:
+        return get_data_version(conn.cursor())
+    finally:
+        conn.close()
+
+def cached_endpoint(max_age=None):
+    """Serve a read endpoint from response_cache until the data version changes.
+
+    Responses carry an ETag so polling clients get 304 Not Modified.
+    max_age (seconds) also expires responses that depend on the current
+    time, such as counts over the last 24 hours.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = current_data_version()
+            if max_age:
+                version = (version, int(time.time() // max_age))
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+
+            def compute():
+                response = app.make_response(view(*args, **kwargs))
+                return response.status_code, response.get_data(), response.mimetype
+
+            cached = response_cache.get_or_compute(key, version, compute)
+            response = app.response_class(cached.body, status=cached.status, mimetype=cached.mimetype)
+            if cached.status == 200:
+                response.set_etag(cached.etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                response = response.make_conditional(request)
+            return response
+        return wrapper
+    return decorator
+
+def label_counts(cursor, column):
+    """Tweet counts per sentiment or category label, summed from the weekly rollup buckets"""
+    table = {rollup_column: table for table, rollup_column in ROLLUP_TABLES}[column]
+    cursor.execute(f'''
+        SELECT {column}, SUM(count) as count
+        FROM {table}
+        WHERE resolution = 'week'
+        GROUP BY {column}
+        ORDER BY count DESC
+    ''')
+    return [dict(row) for row in cursor.fetchall()]
+
+def tweet_totals(cursor):
+    """Total tweets, from the per-author counts, and tweets from the last 24 hours"""
+    cursor.execute('SELECT COALESCE(SUM(tweet_count), 0) as total FROM authors')
+    result = cursor.fetchone()
+    
+    cursor.execute('''
+        SELECT COUNT(*) as recent 
+        FROM tweets 
+        WHERE timestamp_epoch >= ?
+    ''', (int(time.time()) - 86400,))
+    recent = cursor.fetchone()
+    
+    return {
+        'total_tweets': result['total'],
+        'last_24h': recent['recent']
+    }
 
 @app.route('/')
 def index():
     """Render the main dashboard page"""
-    return render_template('dashboard.html')
+    return render_template('dashboard.html', timeline_resolutions=TIMELINE_RESOLUTIONS)
 
 @app.route('/api/sentiment_counts')
+@cached_endpoint()
 def sentiment_counts():
     """Get counts of tweets by sentiment"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT sentiment, COUNT(*) as count
-        FROM tweets
-        WHERE sentiment IS NOT NULL
-        GROUP BY sentiment
-        ORDER BY count DESC
-    ''')
-    
-    results = [dict(row) for row in cursor.fetchall()]
+    results = label_counts(conn.cursor(), 'sentiment')
     conn.close()
     
     return jsonify(results)
 
 @app.route('/api/category_counts')
+@cached_endpoint()
 def category_counts():
     """Get counts of tweets by category"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT category, COUNT(*) as count
-        FROM tweets
-        WHERE category IS NOT NULL
-        GROUP BY category
-        ORDER BY count DESC
-    ''')
-    
-    results = [dict(row) for row in cursor.fetchall()]
+    results = label_counts(conn.cursor(), 'category')
     conn.close()
     
     return jsonify(results)
 
-@app.route('/api/sentiment_timeline')
-def sentiment_timeline():
-    """Get sentiment counts over time"""
-    start_date = request.args.get('start_date', default=None)
-    end_date = request.args.get('end_date', default=None)
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Longest range (in days) served at each resolution before stepping up to the next
+TIMELINE_RESOLUTIONS = [('hour', 3), ('day', 180), ('week', None)]
+
+def pick_resolution(start_date, end_date, requested=None):
+    """Choose the rollup resolution that keeps the timeline payload bounded"""
+    if requested in ROLLUP_BUCKETS:
+        return requested
+    if not start_date:
+        return 'week'
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.utcnow()
+    except ValueError:
+        return 'day'
+    span_days = (end - start).days + 1
+    for resolution, max_days in TIMELINE_RESOLUTIONS:
+        if max_days is None or span_days <= max_days:
+            return resolution
+
+def timeline_rows(cursor, table, column, args):
+    """Read a timeline from the rollup table at a resolution matching the requested range"""
+    start_date = args.get('start_date', default=None)
+    end_date = args.get('end_date', default=None)
+    resolution = pick_resolution(start_date, end_date, args.get('resolution'))
     
-    query = '''
+    query = f'''
         SELECT 
-            DATE(timestamp) as date,
-            sentiment,
-            COUNT(*) as count
-        FROM tweets
-        WHERE sentiment IS NOT NULL
+            bucket as date,
+            {column},
+            count
+        FROM {table}
+        WHERE resolution = ?
     '''
     
-    params = []
+    params = [resolution]
     if start_date:
-        query += ' AND DATE(timestamp) >= ?'
+        # Include the bucket the start date falls in, e.g. the week it belongs to
+        query += f" AND bucket >= {ROLLUP_BUCKETS[resolution].format(column='?')}"
         params.append(start_date)
     if end_date:
-        query += ' AND DATE(timestamp) <= ?'
+        query += " AND bucket < date(?, '+1 day')"
         params.append(end_date)
     
-    query += ' GROUP BY DATE(timestamp), sentiment ORDER BY date'
+    query += f' ORDER BY bucket, {column}'
     
     cursor.execute(query, params)
-    results = [dict(row) for row in cursor.fetchall()]
+    return [dict(row) for row in cursor.fetchall()]
+
+def rollup_timeline(table, column):
+    """Timeline endpoint response for one rollup table"""
+    conn = get_db_connection()
+    results = timeline_rows(conn.cursor(), table, column, request.args)
     conn.close()
     
     return jsonify(results)
 
+@app.route('/api/sentiment_timeline')
+@cached_endpoint()
+def sentiment_timeline():
+    """Get sentiment counts over time"""
+    return rollup_timeline('sentiment_rollups', 'sentiment')
+
 @app.route('/api/category_timeline')
+@cached_endpoint()
 def category_timeline():
     """Get category counts over time"""
-    start_date = request.args.get('start_date', default=None)
-    end_date = request.args.get('end_date', default=None)
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = '''
-        SELECT 
-            DATE(timestamp) as date,
-            category,
-            COUNT(*) as count
-        FROM tweets
-        WHERE category IS NOT NULL
-    '''
-    
-    params = []
-    if start_date:
-        query += ' AND DATE(timestamp) >= ?'
-        params.append(start_date)
-    if end_date:
-        query += ' AND DATE(timestamp) <= ?'
-        params.append(end_date)
-    
-    query += ' GROUP BY DATE(timestamp), category ORDER BY date'
-    
-    cursor.execute(query, params)
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(results)
+    return rollup_timeline('category_rollups', 'category')
 
-@app.route('/api/tweets')
-def get_tweets():
-    """Get tweets with optional filtering"""
-    sentiment = request.args.get('sentiment', default=None)
-    category = request.args.get('category', default=None)
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = '''
-        SELECT 
-            tweet_id,
-            author,
-            text,
-            timestamp,
-            sentiment,
-            category,
-            summary,
-            url  
-        FROM tweets
-        WHERE 1=1
-    '''
-    
+# Columns /api/tweets can return, selectable with fields=
+TWEET_FIELDS = ['tweet_id', 'author', 'text', 'timestamp', 'sentiment', 'category', 'summary', 'url']
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(*key):
+    """Opaque cursor pointing just past the row with the given sort key"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(value, types=(int, str)):
+    """Sort key from a cursor made by encode_cursor, checked against the expected types"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidArgument('Invalid cursor')
+    if (not isinstance(key, list) or len(key) != len(types) or
+            not all(isinstance(part, kind) for part, kind in zip(key, types))):
+        raise InvalidArgument('Invalid cursor')
+    return tuple(key)
+
+def page_size(args):
+    """Requested page size, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidArgument('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def tweet_fields(args):
+    """Columns requested with fields=, all of TWEET_FIELDS by default"""
+    requested = args.get('fields')
+    if not requested:
+        return TWEET_FIELDS
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in TWEET_FIELDS]
+    if unknown:
+        raise InvalidArgument(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def recent_tweets(cursor, args):
+    """One page of tweets, newest first, optionally filtered by sentiment and category.
+
+    Pages are keyset-paginated on (timestamp_epoch, tweet_id): ``cursor``
+    continues after the last row of the previous page, so a deep page costs
+    the same index range scan as the first. Tweets without a parseable
+    timestamp sort after all dated ones, by tweet_id, and their cursors
+    carry a null epoch.
+    """
+    sentiment = args.get('sentiment', default=None)
+    category = args.get('category', default=None)
+    limit = page_size(args)
+    fields = tweet_fields(args)
+    after = decode_cursor(args.get('cursor'), types=((int, type(None)), str)) if args.get('cursor') else None
+    # The sort key is always read so the next cursor can be built
+    columns = ', '.join(dict.fromkeys(fields + ['tweet_id', 'timestamp_epoch']))
+    
+    filters = ''
     params = []
     if sentiment and sentiment != 'all':
-        query += ' AND sentiment = ?'
+        filters += ' AND sentiment = ?'
         params.append(sentiment)
     if category and category != 'all':
-        query += ' AND category = ?'
+        filters += ' AND category = ?'
         params.append(category)
     
-    query += ' ORDER BY timestamp DESC LIMIT 100'
-    
-    cursor.execute(query, params)
-    tweets = [dict(row) for row in cursor.fetchall()]
+    # One extra row tells whether there is a next page
+    rows = []
+    if after is None or after[0] is not None:
+        query = f'SELECT {columns} FROM tweets WHERE timestamp_epoch IS NOT NULL{filters}'
+        dated_params = list(params)
+        if after is not None:
+            query += ' AND (timestamp_epoch, tweet_id) < (?, ?)'
+            dated_params.extend(after)
+        query += ' ORDER BY timestamp_epoch DESC, tweet_id DESC LIMIT ?'
+        cursor.execute(query, dated_params + [limit + 1])
+        rows = cursor.fetchall()
+    
+    if len(rows) <= limit:
+        # Undated tweets follow once the dated ones run out, on the same index
+        query = f'SELECT {columns} FROM tweets WHERE timestamp_epoch IS NULL{filters}'
+        undated_params = list(params)
+        if after is not None and after[0] is None:
+            query += ' AND tweet_id < ?'
+            undated_params.append(after[1])
+        query += ' ORDER BY tweet_id DESC LIMIT ?'
+        cursor.execute(query, undated_params + [limit + 1 - len(rows)])
+        rows += cursor.fetchall()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['timestamp_epoch'], rows[-1]['tweet_id'])
+    
+    return {
+        'tweets': [{field: row[field] for field in fields} for row in rows],
+        'next_cursor': next_cursor
+    }
+
+@app.route('/api/tweets')
+@cached_endpoint()
+def get_tweets():
+    """Get a page of tweets with optional filtering, paging and field selection"""
+    conn = get_db_connection()
+    tweets = recent_tweets(conn.cursor(), request.args)
     conn.close()
     
     return jsonify(tweets)
 
-@app.route('/api/filters')
-def get_filters():
-    """Get unique sentiments and categories for filters"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def filter_options(cursor):
+    """Unique sentiments and categories for the tweet filters"""
     # Get unique sentiments
     cursor.execute('SELECT DISTINCT sentiment FROM tweets WHERE sentiment IS NOT NULL')
     sentiments = [row[0] for row in cursor.fetchall()]
@@ -176,22 +393,25 @@ def get_filters():
     cursor.execute('SELECT DISTINCT category FROM tweets WHERE category IS NOT NULL')
     categories = [row[0] for row in cursor.fetchall()]
     
-    conn.close()
-    
-    return jsonify({
+    return {
         'sentiments': sentiments,
         'categories': categories
-    })
+    }
 
-# Add these new routes to your existing app.py
-@app.route('/api/trends')
-def get_trends():
-    """Get trending topics with counts"""
-    start_date = request.args.get('start_date', default=None)
-    end_date = request.args.get('end_date', default=None)
-    
+@app.route('/api/filters')
+@cached_endpoint()
+def get_filters():
+    """Get unique sentiments and categories for filters"""
     conn = get_db_connection()
-    cursor = conn.cursor()
+    filters = filter_options(conn.cursor())
+    conn.close()
+    
+    return jsonify(filters)
+
+def trending_topics(cursor, args):
+    """Top trending topics within the requested date range"""
+    start_date = args.get('start_date', default=None)
+    end_date = args.get('end_date', default=None)
     
     query = '''
         SELECT 
@@ -204,141 +424,456 @@ def get_trends():
     
     params = []
     if start_date:
-        query += ' AND DATE(timestamp) >= ?'
-        params.append(start_date)
+        query += ' AND timestamp_epoch >= ?'
+        params.append(date_to_epoch(start_date))
     if end_date:
-        query += ' AND DATE(timestamp) <= ?'
-        params.append(end_date)
+        query += ' AND timestamp_epoch < ?'
+        params.append(date_to_epoch(end_date, days=1))
     
     query += ' GROUP BY topic, category ORDER BY count DESC LIMIT 10'
     
     cursor.execute(query, params)
-    trends = [dict(row) for row in cursor.fetchall()]
+    return [dict(row) for row in cursor.fetchall()]
+
+# Add these new routes to your existing app.py
+@app.route('/api/trends')
+@cached_endpoint()
+def get_trends():
+    """Get trending topics with counts"""
+    conn = get_db_connection()
+    trends = trending_topics(conn.cursor(), request.args)
     conn.close()
     
     return jsonify(trends)
 
-@app.route('/api/recommendations')
-def get_recommendations():
-    """Get account recommendations with frequency"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def top_recommendations(cursor):
+    """Accounts recommended most often over the last 7 days"""
     cursor.execute('''
         SELECT 
             username,
             display_name,
             COUNT(*) as frequency
         FROM follow_recommendations
-        WHERE timestamp >= datetime('now', '-7 days')
+        WHERE timestamp_epoch >= ?
         GROUP BY username, display_name
         ORDER BY frequency DESC
         LIMIT 20
-    ''')
-    
-    recommendations = [dict(row) for row in cursor.fetchall()]
+    ''', (int(time.time()) - 7 * 86400,))
+    return [dict(row) for row in cursor.fetchall()]
+
+@app.route('/api/recommendations')
+@cached_endpoint(max_age=300)
+def get_recommendations():
+    """Get account recommendations with frequency"""
+    conn = get_db_connection()
+    recommendations = top_recommendations(conn.cursor())
     conn.close()
     
     return jsonify(recommendations)
 
+def top_authors(cursor, limit=500):
+    """Authors seen more than once, most tweets first, from the authors table"""
+    cursor.execute('''
+        SELECT 
+            author,
+            COALESCE(handle, author) as author_handle,
+            tweet_count as count
+        FROM authors
+        WHERE tweet_count > 1
+        ORDER BY tweet_count DESC
+        LIMIT ?
+    ''', (limit,))
+    return [dict(row) for row in cursor.fetchall()]
+
 @app.route('/api/author_frequencies')
+@cached_endpoint()
 def author_frequencies():
     """Get tweet author frequencies with handles extracted from URLs"""
-    print("\n=== Starting Author Frequencies Analysis ===")
-    
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    print("Executing database query...")
-    cursor.execute('''
-        SELECT 
-            author,
-            COUNT(*) as count,
-            (SELECT url FROM tweets t2 
-             WHERE t2.author = t1.author 
-             LIMIT 1) as sample_url
-        FROM tweets t1
-        GROUP BY author
-        HAVING count > 1
-        ORDER BY count DESC
-        LIMIT 500
-    ''')
-    
-    # Fetch rows once
-    rows = cursor.fetchall()
-    print(f"\nFound {len(rows)} authors with multiple tweets")
-    
-    results = []
-    for row in rows:  # Use the rows we already fetched
-        print(f"\nProcessing author: {row['author']}")
-        print(f"Tweet count: {row['count']}")
-        print(f"Sample URL: {row['sample_url']}")
-        
-        try:
-            url = row['sample_url']
-            if url and '/status/' in url:
-                # Split URL path and get the username part
-                parts = url.split('/')
-                if len(parts) >= 5:
-                    handle = parts[3]
-                    print(f"Extracted handle: {handle}")
-                    results.append({
-                        'author': row['author'],
-                        'author_handle': handle,
-                        'count': row['count']
-                    })
-            else:
-                print(f"Using author name as handle for: {row['author']}")
-                results.append({
-                    'author': row['author'],
-                    'author_handle': row['author'],
-                    'count': row['count']
-                })
-                
-        except Exception as e:
-            print(f"Error processing row: {row}")
-            print(f"Error details: {str(e)}")
-            results.append({
-                'author': row['author'],
-                'author_handle': row['author'],
-                'count': row['count']
-            })
-    
-    print(f"\nProcessed {len(results)} total results")
-    print("First 5 results:")
-    for r in results[:5]:
-        print(f"Author: {r['author']}, Handle: {r['author_handle']}, Count: {r['count']}")
-    
+    results = top_authors(conn.cursor())
     conn.close()
+    
     return jsonify(results)
 
 @app.route('/api/stats/total_tweets')
+@cached_endpoint(max_age=60)
 def get_total_tweets():
     """Get total number of tweets in the system"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Get total tweets
-        cursor.execute('SELECT COUNT(*) as total FROM tweets')
-        result = cursor.fetchone()
-        
-        # Get tweets from last 24 hours
-        cursor.execute('''
-            SELECT COUNT(*) as recent 
-            FROM tweets 
-            WHERE timestamp >= datetime('now', '-24 hours')
-        ''')
-        recent = cursor.fetchone()
-        
-        return jsonify({
-            'total_tweets': result['total'],
-            'last_24h': recent['recent']
-        })
+        return jsonify(tweet_totals(cursor))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+# Estimated USD per million tokens (gpt-4o-mini list prices) for the pipeline cost trend
+PROMPT_TOKEN_PRICE = 0.15
+COMPLETION_TOKEN_PRICE = 0.60
+DEFAULT_PIPELINE_RUNS = 30
+MAX_PIPELINE_RUNS = 500
+PIPELINE_COUNTERS = ['items_processed', 'failures', 'llm_requests', 'retries',
+                     'prompt_tokens', 'completion_tokens']
+
+def token_cost(prompt_tokens, completion_tokens):
+    return (prompt_tokens * PROMPT_TOKEN_PRICE + completion_tokens * COMPLETION_TOKEN_PRICE) / 1e6
+
+def pipeline_runs(cursor, args):
+    """Per-stage telemetry of the most recent pipeline runs, oldest first, with throughput and cost"""
+    try:
+        limit = int(args.get('runs', DEFAULT_PIPELINE_RUNS))
+    except ValueError:
+        raise InvalidArgument('runs must be an integer')
+    cursor.execute('''
+        SELECT *
+        FROM pipeline_runs
+        WHERE run_id IN (
+            SELECT run_id FROM pipeline_runs
+            GROUP BY run_id
+            ORDER BY MIN(started_at) DESC
+            LIMIT ?
+        )
+        ORDER BY started_at, stage
+    ''', (max(1, min(limit, MAX_PIPELINE_RUNS)),))
+    
+    runs = {}
+    for row in cursor.fetchall():
+        run = runs.get(row['run_id'])
+        if run is None:
+            run = runs[row['run_id']] = {
+                'run_id': row['run_id'],
+                'code_version': row['code_version'],
+                'started_at': row['started_at'],
+                'finished_at': row['finished_at'],
+                'status': 'succeeded',
+                'duration_seconds': 0.0,
+                'stages': {},
+                **{name: 0 for name in PIPELINE_COUNTERS}
+            }
+        duration = row['duration_seconds']
+        stage = {name: row[name] for name in PIPELINE_COUNTERS}
+        stage.update(
+            status=row['status'],
+            workers=row['workers'],
+            duration_seconds=duration,
+            throughput=row['items_processed'] / duration if duration else None,
+            cost=token_cost(row['prompt_tokens'], row['completion_tokens'])
+        )
+        run['stages'][row['stage']] = stage
+        for name in PIPELINE_COUNTERS:
+            run[name] += row[name]
+        run['duration_seconds'] += duration or 0.0
+        if row['finished_at'] is not None:
+            run['finished_at'] = max(run['finished_at'] or 0, row['finished_at'])
+        if row['status'] != 'succeeded' and run['status'] != 'failed':
+            run['status'] = row['status']
+    
+    for run in runs.values():
+        run['cost'] = token_cost(run['prompt_tokens'], run['completion_tokens'])
+    return list(runs.values())
+
+@app.route('/api/pipeline_runs')
+@cached_endpoint()
+def get_pipeline_runs():
+    """Get stage durations, items, LLM requests, tokens and estimated cost per pipeline run"""
+    conn = get_db_connection()
+    try:
+        runs = pipeline_runs(conn.cursor(), request.args)
+    finally:
+        conn.close()
+    
+    return jsonify(runs)
+
+# Markers around matched terms in FTS5 highlights, replaced after escaping the text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+def match_expression(query):
+    """FTS5 expression requiring every term of a plain search query; a trailing * matches prefixes"""
+    terms = []
+    for term in query.split():
+        prefix = term.endswith('*')
+        term = term.rstrip('*').replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def highlight_html(value):
+    """HTML-escape a highlighted column and wrap the matched terms in <mark>"""
+    if value is None:
+        return None
+    return str(escape(value)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+def search_tweets(cursor, args):
+    """Tweets whose text or summary match ``q``, best bm25 match first.
+
+    Combines with the sentiment, category and date filters, and pages with
+    the same opaque cursor as the tweet list, keyed on (rank, rowid).
+    """
+    expression = match_expression(args.get('q', default=''))
+    if not expression:
+        raise InvalidArgument('q is required')
+    sentiment = args.get('sentiment', default=None)
+    category = args.get('category', default=None)
+    start_date = args.get('start_date', default=None)
+    end_date = args.get('end_date', default=None)
+    limit = page_size(args)
+    
+    query = f'''
+        SELECT 
+            t.tweet_id,
+            t.author,
+            t.text,
+            t.timestamp,
+            t.sentiment,
+            t.category,
+            t.summary,
+            t.url,
+            highlight(tweets_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') as text_highlight,
+            highlight(tweets_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') as summary_highlight,
+            tweets_fts.rank as rank,
+            tweets_fts.rowid as fts_rowid
+        FROM tweets_fts
+        JOIN tweets t ON t.rowid = tweets_fts.rowid
+        WHERE tweets_fts MATCH ?
+    '''
+    
+    params = [expression]
+    if sentiment and sentiment != 'all':
+        query += ' AND t.sentiment = ?'
+        params.append(sentiment)
+    if category and category != 'all':
+        query += ' AND t.category = ?'
+        params.append(category)
+    if start_date:
+        query += ' AND t.timestamp_epoch >= ?'
+        params.append(date_to_epoch(start_date))
+    if end_date:
+        query += ' AND t.timestamp_epoch < ?'
+        params.append(date_to_epoch(end_date, days=1))
+    if args.get('cursor'):
+        query += ' AND (tweets_fts.rank, tweets_fts.rowid) > (?, ?)'
+        params.extend(decode_cursor(args.get('cursor'), types=((int, float), int)))
+    
+    query += ' ORDER BY tweets_fts.rank, tweets_fts.rowid LIMIT ?'
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['rank'], rows[-1]['fts_rowid'])
+    
+    tweets = []
+    for row in rows:
+        tweet = {field: row[field] for field in TWEET_FIELDS}
+        tweet['highlights'] = {
+            'text': highlight_html(row['text_highlight']),
+            'summary': highlight_html(row['summary_highlight'])
+        }
+        tweets.append(tweet)
+    
+    return {
+        'tweets': tweets,
+        'next_cursor': next_cursor
+    }
+
+@app.route('/api/search')
+@cached_endpoint()
+def search():
+    """Full-text search over tweet text and summaries, with highlighted matches"""
+    conn = get_db_connection()
+    try:
+        results = search_tweets(conn.cursor(), request.args)
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        raise InvalidArgument(f"Invalid search query: {e}")
+    finally:
+        conn.close()
+    
+    return jsonify(results)
+
+# Panels served by /api/dashboard: name -> function(cursor, request args)
+DASHBOARD_PANELS = {
+    'stats': lambda cursor, args: tweet_totals(cursor),
+    'sentiment_counts': lambda cursor, args: label_counts(cursor, 'sentiment'),
+    'category_counts': lambda cursor, args: label_counts(cursor, 'category'),
+    'sentiment_timeline': lambda cursor, args: timeline_rows(cursor, 'sentiment_rollups', 'sentiment', args),
+    'category_timeline': lambda cursor, args: timeline_rows(cursor, 'category_rollups', 'category', args),
+    'trends': trending_topics,
+    'filters': lambda cursor, args: filter_options(cursor),
+    'tweets': recent_tweets,
+    'author_frequencies': lambda cursor, args: top_authors(cursor),
+    'pipeline_runs': pipeline_runs,
+}
+
+@app.route('/api/dashboard')
+@cached_endpoint(max_age=60)
+def dashboard_snapshot():
+    """Get several dashboard panels computed from one consistent read of the database.
+
+    ``panels`` is a comma-separated subset of DASHBOARD_PANELS (all by
+    default); the other query arguments are passed to every panel.
+    """
+    selected = request.args.get('panels')
+    names = [name.strip() for name in selected.split(',') if name.strip()] if selected else list(DASHBOARD_PANELS)
+    unknown = [name for name in names if name not in DASHBOARD_PANELS]
+    if unknown:
+        return jsonify({'error': f"Unknown panels: {', '.join(unknown)}"}), 400
+    
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # One read transaction, so every panel sees the same database state
+        cursor.execute('BEGIN')
+        panels = {name: DASHBOARD_PANELS[name](cursor, request.args) for name in names}
+        version = get_data_version(cursor)
+    finally:
+        conn.close()
+    
+    return jsonify({'version': version, 'panels': panels})
+
+# How far back each timeline resolution is pushed to live clients, in days
+LIVE_TIMELINE_DAYS = {'hour': 3, 'day': 31, 'week': 180}
+# Seconds between re-reads of the time-relative stats while no data changes
+LIVE_STATS_REFRESH = 60
+
+def changed_keys(previous, current):
+    """Entries of current that are new or differ from previous"""
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+class LiveChanges:
+    """Diffs the dashboard aggregates between data versions for /api/stream.
+
+    poll() only re-reads the aggregates when the pipeline has bumped the data
+    version (or the 24 hour count may have aged), and returns events carrying
+    just the stats, label counts and timeline buckets that changed.
+    """
+    def __init__(self):
+        self.version = None
+        self.state = None
+        self.last_trend_id = None
+        self.refreshed_at = 0
+
+    def snapshot(self, cursor):
+        """Current totals, label counts and recent timeline buckets.
+
+        Runs on every data version bump, so it reads only the rollup and
+        authors tables and the indexed 24 hour range, never a full pass
+        over tweets.
+        """
+        state = {'stats': tweet_totals(cursor)}
+        for table, column in ROLLUP_TABLES:
+            state[f'{column}_counts'] = {
+                row[column]: row['count'] for row in label_counts(cursor, column)
+            }
+            buckets = {}
+            for resolution, days in LIVE_TIMELINE_DAYS.items():
+                since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+                cursor.execute(f'''
+                    SELECT bucket, {column}, count
+                    FROM {table}
+                    WHERE resolution = ? AND bucket >= {ROLLUP_BUCKETS[resolution].format(column='?')}
+                ''', (resolution, since))
+                for bucket, label, count in cursor.fetchall():
+                    buckets[(resolution, bucket, label)] = count
+            state[f'{column}_timeline'] = buckets
+        cursor.execute('''
+            SELECT COUNT(*), MAX(finished_at), SUM(items_processed), SUM(llm_requests)
+            FROM pipeline_runs
+        ''')
+        state['pipeline_runs'] = tuple(cursor.fetchone())
+        return state
+
+    def new_trends(self, cursor):
+        """Trending topics recorded since the previous poll"""
+        if self.last_trend_id is None:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM trending_topics')
+            self.last_trend_id = cursor.fetchone()[0]
+            return []
+        cursor.execute('''
+            SELECT id, topic, category, timestamp
+            FROM trending_topics
+            WHERE id > ?
+            ORDER BY id
+        ''', (self.last_trend_id,))
+        rows = cursor.fetchall()
+        if rows:
+            self.last_trend_id = rows[-1]['id']
+        return [{'topic': row['topic'], 'category': row['category'], 'timestamp': row['timestamp']}
+                for row in rows]
+
+    def poll(self):
+        """Return (event, data, version) tuples for everything that changed"""
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            # Read every aggregate from the same snapshot of the database
+            cursor.execute('BEGIN')
+            version = get_data_version(cursor)
+            if version == self.version and time.time() - self.refreshed_at < LIVE_STATS_REFRESH:
+                return []
+            state = self.snapshot(cursor)
+            trends = self.new_trends(cursor)
+        finally:
+            conn.close()
+
+        previous = self.state
+        self.state, self.version, self.refreshed_at = state, version, time.time()
+        if previous is None:
+            return []
+
+        events = []
+        if state['stats'] != previous['stats']:
+            new_tweets = state['stats']['total_tweets'] - previous['stats']['total_tweets']
+            events.append(('stats', dict(state['stats'], new_tweets=new_tweets)))
+        for table, column in ROLLUP_TABLES:
+            counts = changed_keys(previous[f'{column}_counts'], state[f'{column}_counts'])
+            if counts:
+                events.append((f'{column}_counts', [
+                    {column: label, 'count': count} for label, count in counts.items()
+                ]))
+            buckets = changed_keys(previous[f'{column}_timeline'], state[f'{column}_timeline'])
+            if buckets:
+                events.append((f'{column}_timeline', [
+                    {'resolution': resolution, 'date': bucket, column: label, 'count': count}
+                    for (resolution, bucket, label), count in sorted(buckets.items())
+                ]))
+        if trends:
+            events.append(('trends', trends))
+        if state['pipeline_runs'] != previous['pipeline_runs']:
+            # Clients re-read the pipeline_runs panel rather than patching it
+            events.append(('pipeline_runs', {}))
+        return [(event, data, version) for event, data in events]
+
+live_changes = LiveChanges()
+broadcaster = EventBroadcaster(live_changes.poll)
+
+REGISTRY.register(CallbackMetric(
+    'dashboard_stream_clients',
+    'Connected /api/stream clients',
+    'gauge',
+    lambda: [({}, len(broadcaster.subscribers))]
+))
+
+@app.route('/metrics')
+def metrics():
+    """Expose request, SQL and cache metrics in the Prometheus text format"""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/stream')
+def stream():
+    """Push dashboard changes to the page as Server-Sent Events"""
+    response = app.response_class(broadcaster.stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 if __name__ == '__main__':
-    app.run(debug=True, port=2001)
+    migrate()
+    app.run(debug=True, port=2001, threaded=True)
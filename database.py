@@ -0,0 +1,671 @@
+import sqlite3
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+DB_FILE = "twitter_data.db"
+
+
+def add_missing_columns(cursor, table, columns):
+    """Add columns to an existing table, skipping the ones already present"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing_columns = {col[1] for col in cursor.fetchall()}
+    for column, data_type in columns.items():
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {data_type}")
+            logging.info(f"Added new column: {table}.{column}")
+
+
+def migration_001_base_schema(cursor):
+    """Tweets, trends, recommendations and analysis cache tables"""
+    # Rows are inserted by the scraper; databases created before this
+    # migration already have the table and only gain the missing columns
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tweets (
+            tweet_id TEXT PRIMARY KEY,
+            author TEXT,
+            text TEXT,
+            timestamp DATETIME,
+            url TEXT
+        )
+    ''')
+    add_missing_columns(cursor, 'tweets', {
+        'processed': 'BOOLEAN DEFAULT FALSE',
+        'processed_at': 'DATETIME',
+        'summary': 'TEXT',
+        'sentiment': 'TEXT',
+        'category': 'TEXT',
+        'analysis_attempts': 'INTEGER DEFAULT 0',
+        'analysis_failed': 'BOOLEAN DEFAULT FALSE',
+        'last_error': 'TEXT',
+        'claimed_by': 'TEXT',
+        'lease_expires_at': 'REAL'
+    })
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trending_topics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT,
+            category TEXT,
+            tweet_volume INTEGER,
+            timestamp DATETIME,
+            screenshot_ref TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS follow_recommendations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            display_name TEXT,
+            description TEXT,
+            timestamp DATETIME,
+            screenshot_ref TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            text_hash TEXT PRIMARY KEY,
+            summary TEXT,
+            sentiment TEXT,
+            category TEXT,
+            created_at REAL,
+            last_used_at REAL,
+            hit_count INTEGER DEFAULT 0
+        )
+    ''')
+
+
+def migration_002_indexes(cursor):
+    """Indexes for the analyzer work queue and the dashboard queries"""
+    # Partial index over the work queue; the WHERE clause must match the one
+    # in TweetAnalyzer.get_unprocessed_tweets for SQLite to use it
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_unprocessed
+        ON tweets (lease_expires_at)
+        WHERE processed IS FALSE OR processed IS NULL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_timestamp ON tweets (timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_sentiment_timestamp ON tweets (sentiment, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_category_timestamp ON tweets (category, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_author ON tweets (author)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trending_topics_timestamp ON trending_topics (timestamp)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_follow_recommendations_timestamp
+        ON follow_recommendations (timestamp)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache (last_used_at)')
+
+
+def outside_transaction(migration):
+    """Mark a migration that SQLite refuses to run inside a transaction"""
+    migration.outside_transaction = True
+    return migration
+
+
+@outside_transaction
+def migration_003_wal(cursor):
+    """Switch to write-ahead logging so readers never block on the pipeline's writes"""
+    # journal_mode=WAL is persistent, so it only has to be set once per database file
+    cursor.execute('PRAGMA journal_mode=WAL')
+    mode = cursor.fetchone()[0]
+    if mode.lower() != 'wal':
+        raise sqlite3.OperationalError(f"Could not enable WAL journaling, mode is {mode}")
+
+
+# Bucket start expressions for the timeline rollups; weeks start on Monday
+ROLLUP_BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', {column})",
+    'day': "date({column})",
+    'week': "date({column}, 'weekday 0', '-6 days')",
+}
+# (rollup table, labelled tweets column)
+ROLLUP_TABLES = [
+    ('sentiment_rollups', 'sentiment'),
+    ('category_rollups', 'category'),
+]
+
+
+def add_to_rollups(cursor, where='1=1', params=()):
+    """Add the tweets matching ``where`` to every rollup resolution and table"""
+    for table, column in ROLLUP_TABLES:
+        for resolution, bucket in ROLLUP_BUCKETS.items():
+            bucket = bucket.format(column='timestamp')
+            # The SELECT needs its WHERE clause for SQLite to parse the upsert
+            cursor.execute(f'''
+                INSERT INTO {table} (resolution, bucket, {column}, count)
+                SELECT ?, {bucket} AS bucket, {column}, COUNT(*)
+                FROM tweets
+                WHERE {column} IS NOT NULL AND {bucket} IS NOT NULL AND ({where})
+                GROUP BY bucket, {column}
+                ON CONFLICT (resolution, bucket, {column})
+                DO UPDATE SET count = count + excluded.count
+            ''', (resolution, *params))
+
+
+def update_rollups(cursor, tweet_ids):
+    """Count newly analyzed tweets into the rollups, in the caller's transaction"""
+    tweet_ids = list(tweet_ids)
+    for i in range(0, len(tweet_ids), 500):
+        chunk = tweet_ids[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        add_to_rollups(cursor, f'tweet_id IN ({placeholders})', chunk)
+
+
+def migration_004_timeline_rollups(cursor):
+    """Hourly, daily and weekly sentiment/category counts, backfilled from analyzed tweets"""
+    for table, column in ROLLUP_TABLES:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                resolution TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                {column} TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (resolution, bucket, {column})
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'DELETE FROM {table}')
+    add_to_rollups(cursor, 'processed IS TRUE')
+
+
+# Tables with a text timestamp and the key used to update a single row
+EPOCH_TABLES = [
+    ('tweets', 'tweet_id'),
+    ('trending_topics', 'id'),
+    ('follow_recommendations', 'id'),
+]
+# Parses ISO timestamps with 'T' or space, fractions and 'Z'/offsets into UTC epoch seconds
+EPOCH_EXPRESSION = "CAST(strftime('%s', {column}) AS INTEGER)"
+
+
+def migration_005_epoch_timestamps(cursor):
+    """Indexed UTC epoch column next to every text timestamp, kept in sync by triggers"""
+    for table, key in EPOCH_TABLES:
+        add_missing_columns(cursor, table, {'timestamp_epoch': 'INTEGER'})
+        cursor.execute(f'''
+            UPDATE {table}
+            SET timestamp_epoch = {EPOCH_EXPRESSION.format(column='timestamp')}
+        ''')
+        # Triggers normalize rows written by any process, including the scraper
+        for event in ('INSERT', 'UPDATE OF timestamp'):
+            trigger = f"trg_{table}_epoch_{event.split()[0].lower()}"
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {trigger}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE {table}
+                    SET timestamp_epoch = {EPOCH_EXPRESSION.format(column='NEW.timestamp')}
+                    WHERE {key} = NEW.{key};
+                END
+            ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_timestamp_epoch
+            ON {table} (timestamp_epoch)
+        ''')
+
+    # The text timestamp indexes are superseded by their epoch equivalents
+    for index in ('idx_tweets_timestamp', 'idx_tweets_sentiment_timestamp',
+                  'idx_tweets_category_timestamp', 'idx_trending_topics_timestamp',
+                  'idx_follow_recommendations_timestamp'):
+        cursor.execute(f'DROP INDEX IF EXISTS {index}')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_sentiment_epoch
+        ON tweets (sentiment, timestamp_epoch)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_category_epoch
+        ON tweets (category, timestamp_epoch)
+    ''')
+
+
+def migration_006_data_version(cursor):
+    """Single-row counter that writers bump so readers can tell when data changed"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 1)')
+    # The scraper inserts tweets directly, so its writes are counted by a trigger
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_data_version
+        AFTER INSERT ON tweets
+        BEGIN
+            UPDATE data_version SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+
+
+def bump_data_version(cursor):
+    """Mark the data as changed, in the caller's transaction"""
+    cursor.execute('UPDATE data_version SET version = version + 1 WHERE id = 1')
+
+
+def get_data_version(cursor):
+    """Current data version, bumped on every committed pipeline write"""
+    cursor.execute('SELECT version FROM data_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def migration_007_keyset_pagination(cursor):
+    """Indexes matching the tweet list's (timestamp_epoch, tweet_id) keyset order"""
+    # Ending each index in the full sort key lets a page at any depth be read
+    # as one index range of LIMIT rows, with no sort step
+    for index in ('idx_tweets_timestamp_epoch', 'idx_tweets_sentiment_epoch', 'idx_tweets_category_epoch'):
+        cursor.execute(f'DROP INDEX IF EXISTS {index}')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_epoch_id
+        ON tweets (timestamp_epoch, tweet_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_sentiment_epoch_id
+        ON tweets (sentiment, timestamp_epoch, tweet_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tweets_category_epoch_id
+        ON tweets (category, timestamp_epoch, tweet_id)
+    ''')
+
+
+def migration_008_full_text_search(cursor):
+    """FTS5 index over tweet text and summaries, kept in sync with tweets by triggers"""
+    # External content table: the index stores no second copy of the text
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5(
+            text,
+            summary,
+            content='tweets',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    # Matches in the tweet itself outrank matches only in the model's summary
+    cursor.execute("INSERT INTO tweets_fts (tweets_fts, rank) VALUES ('rank', 'bm25(1.0, 0.5)')")
+    # Triggers cover rows written by any process: the scraper inserts, the analyzer adds summaries
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_fts_insert
+        AFTER INSERT ON tweets
+        BEGIN
+            INSERT INTO tweets_fts (rowid, text, summary)
+            VALUES (NEW.rowid, NEW.text, NEW.summary);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_fts_delete
+        AFTER DELETE ON tweets
+        BEGIN
+            INSERT INTO tweets_fts (tweets_fts, rowid, text, summary)
+            VALUES ('delete', OLD.rowid, OLD.text, OLD.summary);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_fts_update
+        AFTER UPDATE OF text, summary ON tweets
+        BEGIN
+            INSERT INTO tweets_fts (tweets_fts, rowid, text, summary)
+            VALUES ('delete', OLD.rowid, OLD.text, OLD.summary);
+            INSERT INTO tweets_fts (rowid, text, summary)
+            VALUES (NEW.rowid, NEW.text, NEW.summary);
+        END
+    ''')
+    cursor.execute("INSERT INTO tweets_fts (tweets_fts) VALUES ('rebuild')")
+
+
+def handle_expression(url):
+    """SQL for the handle in a status URL (https://x.com/<handle>/status/<id>), NULL otherwise"""
+    after_scheme = f"substr({url}, instr({url}, '://') + 3)"
+    path = f"substr({after_scheme}, instr({after_scheme}, '/') + 1)"
+    return f"CASE WHEN {url} LIKE '%://%/%/status/%' THEN substr({path}, 1, instr({path}, '/') - 1) END"
+
+
+def migration_009_author_stats(cursor):
+    """Per-author tweet counts, first/last seen and sentiment counts, maintained by triggers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS authors (
+            author TEXT PRIMARY KEY,
+            handle TEXT,
+            tweet_count INTEGER NOT NULL DEFAULT 0,
+            first_seen_epoch INTEGER,
+            last_seen_epoch INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS author_sentiments (
+            author TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (author, sentiment)
+        ) WITHOUT ROWID
+    ''')
+    # Covers the most-seen authors read; the second serves per-sentiment rankings
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_authors_tweet_count
+        ON authors (tweet_count, author, handle)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_author_sentiments_sentiment
+        ON author_sentiments (sentiment, count)
+    ''')
+
+    cursor.execute('DELETE FROM authors')
+    cursor.execute('DELETE FROM author_sentiments')
+    cursor.execute(f'''
+        INSERT INTO authors (author, handle, tweet_count, first_seen_epoch, last_seen_epoch)
+        SELECT author, MAX({handle_expression('url')}), COUNT(*), MIN(timestamp_epoch), MAX(timestamp_epoch)
+        FROM tweets
+        WHERE author IS NOT NULL
+        GROUP BY author
+    ''')
+    cursor.execute('''
+        INSERT INTO author_sentiments (author, sentiment, count)
+        SELECT author, sentiment, COUNT(*)
+        FROM tweets
+        WHERE author IS NOT NULL AND sentiment IS NOT NULL
+        GROUP BY author, sentiment
+    ''')
+
+    epoch = EPOCH_EXPRESSION.format(column='NEW.timestamp')
+    # The handle is extracted once, from the first status URL seen for the author
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_authors_insert
+        AFTER INSERT ON tweets
+        WHEN NEW.author IS NOT NULL
+        BEGIN
+            INSERT INTO authors (author, handle, tweet_count, first_seen_epoch, last_seen_epoch)
+            VALUES (NEW.author, {handle_expression('NEW.url')}, 1, {epoch}, {epoch})
+            ON CONFLICT (author) DO UPDATE SET
+                handle = COALESCE(handle, excluded.handle),
+                tweet_count = tweet_count + 1,
+                first_seen_epoch = MIN(COALESCE(first_seen_epoch, excluded.first_seen_epoch),
+                                       COALESCE(excluded.first_seen_epoch, first_seen_epoch)),
+                last_seen_epoch = MAX(COALESCE(last_seen_epoch, excluded.last_seen_epoch),
+                                      COALESCE(excluded.last_seen_epoch, last_seen_epoch));
+            INSERT INTO author_sentiments (author, sentiment, count)
+            SELECT NEW.author, NEW.sentiment, 1
+            WHERE NEW.sentiment IS NOT NULL
+            ON CONFLICT (author, sentiment) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_authors_sentiment
+        AFTER UPDATE OF sentiment ON tweets
+        WHEN NEW.author IS NOT NULL AND OLD.sentiment IS NOT NEW.sentiment
+        BEGIN
+            UPDATE author_sentiments SET count = count - 1
+            WHERE author = NEW.author AND sentiment = OLD.sentiment;
+            INSERT INTO author_sentiments (author, sentiment, count)
+            SELECT NEW.author, NEW.sentiment, 1
+            WHERE NEW.sentiment IS NOT NULL
+            ON CONFLICT (author, sentiment) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    # Deletes keep the counts right; first/last seen are left as they were
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tweets_authors_delete
+        AFTER DELETE ON tweets
+        WHEN OLD.author IS NOT NULL
+        BEGIN
+            UPDATE authors SET tweet_count = tweet_count - 1 WHERE author = OLD.author;
+            DELETE FROM authors WHERE author = OLD.author AND tweet_count <= 0;
+            UPDATE author_sentiments SET count = count - 1
+            WHERE author = OLD.author AND sentiment = OLD.sentiment;
+        END
+    ''')
+
+
+def migration_010_pipeline_runs(cursor):
+    """Per-stage telemetry for each pipeline run: timings, items, LLM requests and tokens"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            run_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            code_version TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            return_code INTEGER,
+            workers INTEGER NOT NULL DEFAULT 1,
+            started_at REAL,
+            finished_at REAL,
+            duration_seconds REAL,
+            items_processed INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            llm_requests INTEGER NOT NULL DEFAULT 0,
+            retries INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (run_id, stage)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pipeline_runs_started
+        ON pipeline_runs (started_at)
+    ''')
+
+
+def migration_011_processed_screenshots(cursor):
+    """Per-screenshot claims and completion marks, so no screenshot is analyzed twice"""
+    # 'claimed' rows hold a lease; 'pending' rows failed and may be retried;
+    # 'done' is set in the same transaction that saves the screenshot's data
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS processed_screenshots (
+            screenshot TEXT NOT NULL,
+            analyzer TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'claimed',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at REAL,
+            processed_at REAL,
+            PRIMARY KEY (screenshot, analyzer)
+        ) WITHOUT ROWID
+    ''')
+
+
+# Stages that each analyze every timeline screenshot, by their processed_screenshots name
+SCREENSHOT_ANALYZERS = ('Gettweets', 'screenshots_analyze')
+
+
+def screenshots_done_by_all(cursor, screenshots):
+    """The screenshots, by file name, that every analyzer in SCREENSHOT_ANALYZERS has marked done"""
+    screenshots = list(screenshots)
+    if not screenshots:
+        return set()
+    cursor.execute(f'''
+        SELECT screenshot
+        FROM processed_screenshots
+        WHERE status = 'done'
+          AND analyzer IN ({','.join('?' * len(SCREENSHOT_ANALYZERS))})
+          AND screenshot IN ({','.join('?' * len(screenshots))})
+        GROUP BY screenshot
+        HAVING COUNT(*) = ?
+    ''', list(SCREENSHOT_ANALYZERS) + screenshots + [len(SCREENSHOT_ANALYZERS)])
+    return {row[0] for row in cursor.fetchall()}
+
+
+# (version, description, migration) in the order they must be applied
+MIGRATIONS = [
+    (1, "base schema", migration_001_base_schema),
+    (2, "indexes for hot queries", migration_002_indexes),
+    (3, "WAL journaling", migration_003_wal),
+    (4, "timeline rollup tables", migration_004_timeline_rollups),
+    (5, "normalized epoch timestamps", migration_005_epoch_timestamps),
+    (6, "data version counter", migration_006_data_version),
+    (7, "keyset pagination indexes", migration_007_keyset_pagination),
+    (8, "full-text search index", migration_008_full_text_search),
+    (9, "author statistics", migration_009_author_stats),
+    (10, "pipeline run telemetry", migration_010_pipeline_runs),
+    (11, "processed screenshot marks", migration_011_processed_screenshots),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor):
+    """Return the applied schema version, 0 for a database that was never migrated"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+
+def migrate(db_file=DB_FILE):
+    """Bring the database schema up to LATEST_VERSION, applying each migration once"""
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    cursor = conn.cursor()
+
+    try:
+        current = get_schema_version(cursor)
+        if current >= LATEST_VERSION:
+            return LATEST_VERSION
+
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
+
+            in_transaction = not getattr(migration, 'outside_transaction', False)
+            if in_transaction:
+                # Re-check under the write lock in case another process migrated first
+                cursor.execute('BEGIN IMMEDIATE')
+                if get_schema_version(cursor) >= version:
+                    cursor.execute('COMMIT')
+                    continue
+
+            logging.info(f"Applying schema migration {version}: {description}")
+            migration(cursor)
+            cursor.execute(
+                'INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            if in_transaction:
+                cursor.execute('COMMIT')
+
+        logging.info(f"Database schema is at version {LATEST_VERSION}")
+        return LATEST_VERSION
+
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def connect(db_file=DB_FILE, timeout=30):
+    """Open a connection in autocommit mode so callers manage transactions explicitly"""
+    conn = sqlite3.connect(db_file, timeout=timeout, isolation_level=None, check_same_thread=False)
+    # In WAL mode NORMAL only syncs at checkpoints and is still crash-safe
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def connect_readonly(db_file=DB_FILE, busy_timeout_ms=1000, mmap_size=256 * 1024 * 1024,
+                     cache_size_kib=16 * 1024, factory=sqlite3.Connection):
+    """Open a read-only connection tuned for the dashboard's aggregate queries.
+
+    ``factory`` is the connection class, e.g. one that times its statements.
+    """
+    uri = f"file:{os.path.abspath(db_file)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout_ms / 1000, check_same_thread=False,
+                           factory=factory)
+    conn.execute('PRAGMA query_only=ON')
+    conn.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f'PRAGMA cache_size=-{int(cache_size_kib)}')
+    conn.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+    return conn
+
+
+class SharedConnection:
+    """A single connection reused across calls and threads.
+
+    Each ``transaction()`` holds a lock for its duration, so the analyzers can
+    run their database work in worker threads without opening a new
+    connection per batch.
+    """
+
+    def __init__(self, db_file=DB_FILE, timeout=30):
+        self.DB_FILE = db_file
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = connect(self.DB_FILE, self.timeout)
+        return self._conn
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """Run a block in one transaction, committing on success and rolling back on error.
+
+        ``immediate`` takes the write lock up front, which avoids deadlocks
+        between processes that read and then write in the same transaction.
+        """
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            else:
+                cursor.execute('COMMIT')
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close the underlying connection"""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ReadOnlyConnectionPool:
+    """Pool of read-only connections, each used by one thread at a time.
+
+    ``acquire`` hands out an idle connection or opens a new one; ``release``
+    keeps up to ``max_idle`` connections around for the next request.
+    """
+
+    def __init__(self, db_file=DB_FILE, max_idle=8, row_factory=None, **options):
+        self.DB_FILE = db_file
+        self.row_factory = row_factory
+        self.options = options
+        self.idle = queue.LifoQueue(maxsize=max_idle)
+
+    def acquire(self):
+        """Take a connection from the pool"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            conn = connect_readonly(self.DB_FILE, **self.options)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
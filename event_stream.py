@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+
+def format_event(event, data, event_id=None):
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroadcaster:
+    """Fans change events out to every connected Server-Sent Events client.
+
+    A single background thread calls ``poll`` every ``poll_interval`` seconds
+    and publishes the ``(event, data, event_id)`` tuples it returns, so the
+    database is read once per change however many tabs are listening. The
+    thread only runs while someone is subscribed.
+    """
+
+    def __init__(self, poll, poll_interval=1.0, heartbeat_interval=15,
+                 retry_ms=5000, max_queue=100):
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_ms = retry_ms
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+
+    def subscribe(self):
+        """Register a client and make sure the poller is running"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='event-broadcaster', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, message):
+        """Queue an encoded message for every subscriber"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A client this far behind reloads everything instead of replaying deltas
+                self.drain(subscriber)
+                subscriber.put_nowait(format_event('resync', {}))
+
+    @staticmethod
+    def drain(subscriber):
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self):
+        """Poll for changes until the last subscriber disconnects"""
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            try:
+                for event, data, event_id in self.poll():
+                    self.publish(format_event(event, data, event_id))
+            except Exception as e:
+                logging.error(f"Error polling for dashboard changes: {e}")
+            time.sleep(self.poll_interval)
+
+    def stream(self):
+        """Generator of SSE messages for one client, with keep-alive comments"""
+        subscriber = self.subscribe()
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,67 @@
+import base64
+import io
+import math
+from collections import namedtuple
+from PIL import Image
+
+# High-detail vision inputs are scaled to fit 2048x2048, then until the shortest side is 768px
+MODEL_MAX_SIDE = 2048
+MODEL_SHORT_SIDE = 768
+TILE_SIZE = 512
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+# How screenshots are resized and encoded before upload
+ImageSettings = namedtuple('ImageSettings', ['format', 'quality', 'max_dimension', 'max_tiles'],
+                           defaults=['JPEG', 85, None, None])
+EncodedImage = namedtuple('EncodedImage', ['data', 'mime_type', 'width', 'height', 'size'])
+
+
+def vision_tiles(width, height):
+    """512px tiles the vision model bills for an image it does not need to rescale"""
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def model_size(width, height):
+    """Size the vision model rescales an image to, so larger uploads carry no extra detail"""
+    scale = min(1.0, MODEL_MAX_SIDE / max(width, height), MODEL_SHORT_SIDE / min(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def target_size(width, height, max_dimension=None, max_tiles=None):
+    """Upload size: the model's own size, shrunk further to max_dimension and the tile budget"""
+    width, height = model_size(width, height)
+    if max_dimension and max(width, height) > max_dimension:
+        scale = max_dimension / max(width, height)
+        width, height = max(1, int(width * scale)), max(1, int(height * scale))
+
+    if max_tiles is not None and vision_tiles(width, height) > max_tiles:
+        # The largest scale that lands a side on a tile boundary and fits the budget;
+        # a budget under one tile gets the smallest upload, a single tile
+        scales = sorted({TILE_SIZE * k / side for side in (width, height)
+                         for k in range(1, side // TILE_SIZE + 1)}, reverse=True)
+        scale = next((scale for scale in scales
+                      if vision_tiles(int(width * scale), int(height * scale)) <= max_tiles),
+                     min(1.0, TILE_SIZE / max(width, height)))
+        width, height = max(1, int(width * scale)), max(1, int(height * scale))
+    return width, height
+
+
+def encode_image(image, settings=ImageSettings()):
+    """Resize and encode an image in memory, returning it base64-encoded with its MIME type"""
+    width, height = target_size(image.width, image.height, settings.max_dimension, settings.max_tiles)
+    if (width, height) != image.size:
+        image = image.resize((width, height), Image.LANCZOS)
+    image_format = settings.format.upper()
+    if image_format != 'PNG' and image.mode != 'RGB':
+        # Screenshots are opaque; dropping alpha keeps JPEG possible and WebP smaller
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    if image_format == 'PNG':
+        image.save(buffer, format='PNG', optimize=True)
+    else:
+        image.save(buffer, format=image_format, quality=settings.quality)
+    data = buffer.getvalue()
+    return EncodedImage(base64.b64encode(data).decode('ascii'), MIME_TYPES[image_format],
+                        width, height, len(data))
@@ -0,0 +1,185 @@
+import os
+import sys
+import asyncio
+import logging
+import aiohttp
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_MODEL = "gpt-4o-mini"
+API_KEY_FILE = "openai_key.txt"
+
+
+class AuthenticationError(Exception):
+    """No usable API key: the server rejected it, or there was none and no terminal to ask for one"""
+
+
+def get_api_key(api_key_file=API_KEY_FILE):
+    """Get OpenAI API key from file or user input, asking only when stdin is a terminal"""
+    if os.path.exists(api_key_file):
+        try:
+            with open(api_key_file, 'r') as f:
+                key = f.read().strip()
+            if key:
+                logging.info("API key loaded from file")
+                return key
+        except Exception as e:
+            logging.error(f"Error reading API key file: {e}")
+
+    if not sys.stdin or not sys.stdin.isatty():
+        raise AuthenticationError(f"No OpenAI API key in {api_key_file} and no terminal to ask for one")
+    print("\nOpenAI API key not found or invalid.")
+    key = input("Please enter your OpenAI API key: ").strip()
+
+    try:
+        with open(api_key_file, 'w') as f:
+            f.write(key)
+        logging.info("API key saved to file")
+    except Exception as e:
+        logging.error(f"Error saving API key: {e}")
+
+    return key
+
+
+class LLMClient:
+    """Async chat completion client sharing one pooled keep-alive session.
+
+    The base URL defaults to the OpenAI API but can be pointed at any
+    compatible server, either through ``base_url`` or the ``LLM_BASE_URL``
+    environment variable.
+    """
+
+    def __init__(self, api_key=None, base_url=None, api_key_file=API_KEY_FILE,
+                 max_connections=20, max_connections_per_host=10,
+                 keepalive_timeout=60, request_timeout=120):
+        self.API_KEY_FILE = api_key_file
+        self.base_url = (base_url or os.environ.get("LLM_BASE_URL") or DEFAULT_BASE_URL).rstrip('/')
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.api_key = api_key or get_api_key(self.API_KEY_FILE)
+        self._session = None
+        # A rejected key is re-prompted for at most once, by one request at a time
+        self._auth_lock = asyncio.Lock()
+        self._auth_prompted = False
+        # Usage counters for pipeline run telemetry
+        self.requests = 0
+        self.failed_requests = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def get_session(self):
+        """Return the shared session, creating the connection pool on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+
+    def reset_api_key(self):
+        """Discard the stored API key and ask for a new one"""
+        if os.path.exists(self.API_KEY_FILE):
+            os.remove(self.API_KEY_FILE)
+        self.api_key = get_api_key(self.API_KEY_FILE)
+
+    async def replace_rejected_key(self, rejected_key):
+        """Whether a request rejected with ``rejected_key`` may retry with a new key.
+
+        Only the first rejection asks on the terminal, in a worker thread so
+        the event loop keeps running; requests that were rejected while it
+        asked retry with the key it got.
+        """
+        async with self._auth_lock:
+            if self.api_key != rejected_key:
+                return True
+            if self._auth_prompted or not sys.stdin or not sys.stdin.isatty():
+                return False
+            self._auth_prompted = True
+            await asyncio.get_running_loop().run_in_executor(None, self.reset_api_key)
+            return True
+
+    async def chat_completion(self, messages, model=DEFAULT_MODEL, max_tokens=1000,
+                              response_format=None, retry_on_auth_error=True):
+        """Send a chat completion request and return the decoded response, or None on error.
+
+        Raises AuthenticationError when the API key is rejected and cannot be replaced.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens
+        }
+        if response_format:
+            payload["response_format"] = response_format
+
+        session = await self.get_session()
+        api_key = self.api_key
+        self.requests += 1
+        try:
+            async with session.post(
+                f"{self.base_url}/chat/completions",
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {api_key}"
+                },
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    self.record_usage(result)
+                    return result
+
+                self.failed_requests += 1
+                if response.status != 401:
+                    error_text = await response.text()
+                    logging.error(f"OpenAI API error: {error_text}")
+                    return None
+        except Exception:
+            self.failed_requests += 1
+            raise
+
+        logging.error("Invalid API key. Please provide a valid key.")
+        if not (retry_on_auth_error and await self.replace_rejected_key(api_key)):
+            raise AuthenticationError(f"API key rejected (HTTP 401) by {self.base_url}; "
+                                      f"put a valid key in {self.API_KEY_FILE}")
+        self.retries += 1
+        return await self.chat_completion(messages, model, max_tokens, response_format,
+                                          retry_on_auth_error=False)
+
+    def record_usage(self, result):
+        """Add the token counts from a response's ``usage`` field"""
+        usage = (result or {}).get('usage') or {}
+        self.prompt_tokens += usage.get('prompt_tokens') or 0
+        self.completion_tokens += usage.get('completion_tokens') or 0
+
+    def usage_stats(self):
+        """Request and token counters, keyed like the pipeline_runs columns"""
+        return {
+            'llm_requests': self.requests,
+            'retries': self.retries,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens
+        }
+
+    def usage_since(self, baseline):
+        """Counters accumulated since an earlier usage_stats() snapshot, for a client shared across stages"""
+        return {name: value - baseline.get(name, 0) for name, value in self.usage_stats().items()}
+
+    async def close(self):
+        """Close the pooled session and its connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,210 @@
+import hashlib
+import re
+from collections import OrderedDict
+
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+HANDLE_PATTERN = re.compile(r'@\w+')
+# Miscellaneous symbols, dingbats and the emoji planes; each emoji is kept as its own token
+EMOJI = '\u2600-\u27bf\U0001f000-\U0001faff'
+EMOJI_PATTERN = re.compile(f'[{EMOJI}]')
+NON_WORD_PATTERN = re.compile(f'[^\\w\\s{EMOJI}]|_')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_for_similarity(text):
+    """Strip handles, URLs and punctuation that differ between templated posts, keeping words and emoji"""
+    text = (text or '').lower()
+    text = URL_PATTERN.sub(' ', text)
+    text = HANDLE_PATTERN.sub(' ', text)
+    text = NON_WORD_PATTERN.sub(' ', text)
+    text = EMOJI_PATTERN.sub(r' \g<0> ', text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def simhash(text, bits=64):
+    """SimHash fingerprint over word unigrams and bigrams of the normalized text"""
+    return simhash_tokens(normalize_for_similarity(text).split(), bits)
+
+
+def simhash_tokens(tokens, bits=64):
+    """SimHash fingerprint over the unigrams and bigrams of already normalized tokens"""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+
+    weights = [0] * bits
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=bits // 8).digest()
+        value = int.from_bytes(digest, 'big')
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """Incremental LSH index over SimHash fingerprints.
+
+    The fingerprint is split into ``max_distance + 1`` bands, so by the
+    pigeonhole principle any two fingerprints within ``max_distance`` bits
+    share at least one identical band. Lookups only compare against keys in
+    matching buckets instead of the whole index. Keys are kept in least
+    recently used order so callers can evict the oldest.
+    """
+
+    def __init__(self, max_distance=3, bits=64):
+        self.max_distance = max_distance
+        self.bits = bits
+        self.num_bands = max_distance + 1
+        self.band_width = -(-bits // self.num_bands)
+        self.buckets = [{} for _ in range(self.num_bands)]
+        self.fingerprints = OrderedDict()
+
+    def bands(self, fingerprint):
+        """Split a fingerprint into its band values"""
+        mask = (1 << self.band_width) - 1
+        return [(fingerprint >> (i * self.band_width)) & mask for i in range(self.num_bands)]
+
+    def find(self, fingerprint):
+        """Return the closest indexed key within max_distance bits, or None"""
+        best_key = None
+        best_distance = self.max_distance + 1
+        seen = set()
+        for band, value in enumerate(self.bands(fingerprint)):
+            for key in self.buckets[band].get(value, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = hamming_distance(fingerprint, self.fingerprints[key])
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+        return best_key
+
+    def add(self, key, fingerprint):
+        """Index a fingerprint under the given key"""
+        self.fingerprints[key] = fingerprint
+        for band, value in enumerate(self.bands(fingerprint)):
+            self.buckets[band].setdefault(value, []).append(key)
+
+    def remove(self, key):
+        """Drop a key from the index"""
+        fingerprint = self.fingerprints.pop(key)
+        for band, value in enumerate(self.bands(fingerprint)):
+            bucket = self.buckets[band][value]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[band][value]
+
+    def touch(self, key):
+        """Mark a key as recently used"""
+        self.fingerprints.move_to_end(key)
+
+    def oldest(self):
+        """The least recently used key"""
+        return next(iter(self.fingerprints))
+
+    def __contains__(self, key):
+        return key in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+
+class NearDuplicateClusterer:
+    """Groups near-identical tweets so only one representative per cluster is analyzed.
+
+    Representatives stay in the index across batches, so tweets arriving
+    later that match an already analyzed representative get its labels
+    without another model call. At most ``max_entries`` representatives
+    are kept; the least recently matched are evicted with their labels.
+    Tweets with fewer than ``min_tokens`` tokens after normalization are
+    too short for a meaningful fingerprint and are always analyzed alone.
+    """
+
+    def __init__(self, max_distance=3, bits=64, max_entries=50000, min_tokens=4):
+        self.index = NearDuplicateIndex(max_distance=max_distance, bits=bits)
+        self.bits = bits
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self.labels = {}
+        self.copied = 0
+
+    def add_representative(self, key, fingerprint):
+        """Index a representative, evicting the least recently used over max_entries"""
+        self.index.add(key, fingerprint)
+        while len(self.index) > self.max_entries:
+            evicted = self.index.oldest()
+            self.index.remove(evicted)
+            self.labels.pop(evicted, None)
+
+    @staticmethod
+    def copy_labels(tweet_id, labels):
+        """Build an analysis result for a cluster member from its representative"""
+        return {
+            'id': tweet_id,
+            'summary': labels['summary'],
+            'sentiment': labels['sentiment'],
+            'category': labels['category']
+        }
+
+    def cluster(self, tweets):
+        """Split a batch into copied results, representatives and their followers.
+
+        Returns ``(copied_results, representatives, followers)`` where
+        ``followers`` maps a representative's ID to the member IDs that should
+        receive its labels once it has been analyzed.
+        """
+        copied_results = []
+        representatives = []
+        followers = {}
+        for tweet_id, tweet in tweets:
+            tokens = normalize_for_similarity(tweet['text']).split()
+            if len(tokens) < self.min_tokens:
+                # Emoji, links or a handle alone: straight to the model, never indexed
+                representatives.append((tweet_id, tweet))
+                followers[str(tweet_id)] = []
+                continue
+            fingerprint = simhash_tokens(tokens, self.bits)
+            match = self.index.find(fingerprint)
+            if match is not None:
+                self.index.touch(match)
+
+            if match is not None and match in self.labels:
+                copied_results.append(self.copy_labels(tweet_id, self.labels[match]))
+            elif match is not None and match in followers:
+                followers[match].append(tweet_id)
+            else:
+                representatives.append((tweet_id, tweet))
+                followers[str(tweet_id)] = []
+                if match is not None:
+                    # The matched representative failed or is still in flight without
+                    # labels; this tweet takes over the cluster so later copies follow it
+                    self.index.remove(match)
+                self.add_representative(str(tweet_id), fingerprint)
+
+        self.copied += len(copied_results)
+        return copied_results, representatives, followers
+
+    def propagate(self, analyses, followers):
+        """Remember representative labels and copy them to their cluster members"""
+        results = []
+        for result in analyses:
+            if not all(key in result for key in ['id', 'summary', 'sentiment', 'category']):
+                continue
+            key = str(result['id'])
+            if key in self.index:
+                self.labels[key] = result
+            for tweet_id in followers.get(key, []):
+                results.append(self.copy_labels(tweet_id, result))
+
+        self.copied += len(results)
+        return results
@@ -0,0 +1,120 @@
+import asyncio
+import importlib
+import logging
+from database import migrate, SharedConnection
+from llm_client import LLMClient
+from telemetry import stage_name
+
+
+class PipelineStage:
+    """A pipeline script, the stages it waits for and its own concurrency limit.
+
+    ``workers`` is how many copies run when stages are isolated in child
+    processes; ``options`` are keyword arguments for the stage's main()
+    when it runs in-process.
+    """
+
+    def __init__(self, script, depends_on=(), workers=1, options=None):
+        self.script = script
+        self.name = stage_name(script)
+        self.depends_on = [stage_name(dependency) for dependency in depends_on]
+        self.workers = workers
+        self.options = options or {}
+
+
+def select_stages(stages, scripts):
+    """The stages for the given scripts, keeping only dependencies among them"""
+    names = {stage_name(script) for script in scripts}
+    return [
+        PipelineStage(stage.script, [name for name in stage.depends_on if name in names],
+                      stage.workers, stage.options)
+        for stage in stages if stage.name in names
+    ]
+
+
+async def run_stage_graph(stages, run_stage):
+    """Run every stage as soon as the stages it depends on have succeeded.
+
+    Independent stages overlap, so a cycle takes about as long as its
+    slowest chain. ``run_stage(stage)`` is a coroutine returning whether
+    the stage succeeded; a failure only skips the stages that depend on
+    it. Stages must be listed after their dependencies. Returns
+    ``{stage name: True, False, or None if skipped}``.
+    """
+    tasks = {}
+
+    async def run(stage):
+        outcomes = await asyncio.gather(*(tasks[name] for name in stage.depends_on))
+        blocked = [name for name, succeeded in zip(stage.depends_on, outcomes) if not succeeded]
+        if blocked:
+            logging.warning(f"Skipping {stage.name}: {', '.join(blocked)} did not succeed")
+            return None
+        try:
+            return await run_stage(stage)
+        except Exception as e:
+            logging.error(f"Stage {stage.name} failed: {e}")
+            return False
+
+    for stage in stages:
+        unknown = [name for name in stage.depends_on if name not in tasks]
+        if unknown:
+            raise ValueError(f"{stage.name} depends on {', '.join(unknown)}, which must be listed before it")
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+    outcomes = await asyncio.gather(*tasks.values())
+    return dict(zip(tasks, outcomes))
+
+
+class InProcessOrchestrator:
+    """Runs the pipeline stages as coroutines in one long-lived event loop.
+
+    The stage modules are imported once, and every stage of every cycle
+    shares one LLMClient (and its keep-alive connection pool) and one
+    database connection, instead of paying for interpreter startup,
+    imports, the API key read and schema checks per stage.
+    """
+
+    def __init__(self, db_file="twitter_data.db", client=None):
+        self.DB_FILE = db_file
+        self.loop = asyncio.new_event_loop()
+        migrate(db_file)
+        self.db = SharedConnection(db_file)
+        self.client = client or LLMClient()
+        self.modules = {}
+
+    def stage_module(self, stage):
+        """Import a stage's module the first time it runs"""
+        if stage not in self.modules:
+            self.modules[stage] = importlib.import_module(stage)
+        return self.modules[stage]
+
+    async def execute(self, script_name, run_id=None, **options):
+        """Await one stage's main(), returning whether it succeeded"""
+        stage = stage_name(script_name)
+        try:
+            module = self.stage_module(stage)
+            await module.main(client=self.client, db=self.db, run_id=run_id, **options)
+            return True
+        except Exception as e:
+            logging.error(f"Stage {stage} failed: {e}")
+            return False
+
+    def run_stage(self, script_name, run_id=None, **options):
+        """Run one stage to completion on the orchestrator's loop"""
+        return self.loop.run_until_complete(self.execute(script_name, run_id, **options))
+
+    def run_stages(self, stages, run_stage):
+        """Run a cycle of PipelineStages through run_stage_graph on the orchestrator's loop"""
+        return self.loop.run_until_complete(run_stage_graph(stages, run_stage))
+
+    def close(self):
+        """Cancel anything a shutdown interrupted, then close the client, connection and loop"""
+        if self.loop.is_closed() or self.loop.is_running():
+            return
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+        self.db.close()
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedResponse = namedtuple('CachedResponse', ['version', 'status', 'body', 'mimetype', 'etag'])
+
+
+def make_etag(body):
+    """Strong ETag derived from the response body"""
+    return hashlib.sha1(body).hexdigest()[:20]
+
+
+class _Flight:
+    """A computation in progress that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+
+class ResponseCache:
+    """Caches rendered responses per key until the data version changes.
+
+    Identical requests that arrive while a response is being computed wait
+    for that computation instead of running the same queries again
+    (single-flight). Only successful responses are kept.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, version, compute):
+        """Return the cached response for key at version, computing it at most once.
+
+        ``compute`` returns ``(status, body, mimetype)``.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            flight = self.in_flight.get((key, version))
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[(key, version)] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.response is not None:
+                return flight.response
+            # The leader failed; compute for this request without caching
+            return self.build(version, *compute())
+
+        try:
+            response = self.build(version, *compute())
+            flight.response = response
+            if response.status == 200:
+                self.store(key, response)
+            return response
+        finally:
+            with self.lock:
+                self.in_flight.pop((key, version), None)
+            flight.event.set()
+
+    @staticmethod
+    def build(version, status, body, mimetype):
+        return CachedResponse(version, status, body, mimetype, make_etag(body))
+
+    def store(self, key, response):
+        """Keep a response, evicting the least recently used entries beyond max_entries"""
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Fraction of requests served without running the endpoint's queries"""
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
@@ -26,6 +26,8 @@ pip install pytz==2021.3
 pip install playwright==1.28.0
 pip install sqlite3==2.6.0
 pip install d3==0.9.0
+:: Optional: lets start.py --watch react to new screenshots through OS file events
+pip install watchdog==3.0.0
 
 :: Install Playwright browsers
 echo Installing Playwright browsers...
@@ -39,7 +41,7 @@ mkdir templates 2>nul
 
 :: Initialize SQLite database
 echo Initializing database...
-python -c "import sqlite3; conn = sqlite3.connect('twitter_data.db'); conn.close()"
+python -c "import database; database.migrate()"
 
 echo.
 echo Setup completed successfully!
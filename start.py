@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 import time
 import random
@@ -5,8 +6,12 @@ import signal
 import sys
 import datetime
 import logging
-from typing import Optional
+import argparse
+from typing import List, Optional, Set
 import os
+from telemetry import RunRecorder, stage_environment, stage_name
+from orchestrator import InProcessOrchestrator, PipelineStage, run_stage_graph, select_stages
+from triggers import WorkTrigger
 
 # Configure logging
 logging.basicConfig(
@@ -19,9 +24,31 @@ logging.basicConfig(
 )
 
 class ProcessManager:
-    def __init__(self):
+    # Batches each tweet_analyzer worker keeps in flight
+    ANALYZER_CONCURRENCY = 4
+    # Stage run when a WorkTrigger reports each kind of new work
+    TRIGGERED_STAGES = {'screenshots': 'screenshots_analyze.py', 'tweets': 'tweet_analyzer.py'}
+
+    def __init__(self, analyzer_workers: int = 1, isolate_stages: bool = False, watch: bool = False):
         self.dashboard_process: Optional[subprocess.Popen] = None
-        self.current_process: Optional[subprocess.Popen] = None
+        self.stage_processes: List[subprocess.Popen] = []
+        self.analyzer_workers = analyzer_workers
+        # No stage reads what another writes, so all three run side by side: the two vision
+        # analyzers each read screenshots/ and insert trends and recommendations from their own
+        # crop, and tweet_analyzer only reads and updates rows already in tweets
+        self.stages: List[PipelineStage] = [
+            PipelineStage('Gettweets.py'),
+            PipelineStage('screenshots_analyze.py'),
+            PipelineStage('tweet_analyzer.py', workers=analyzer_workers,
+                          options={'concurrency': self.ANALYZER_CONCURRENCY * analyzer_workers}),
+        ]
+        # Stages run in this process unless isolation in child processes is asked for
+        self.isolate_stages = isolate_stages
+        self.orchestrator: Optional[InProcessOrchestrator] = None
+        # Runs the analyzers as soon as new work arrives; the random schedule remains the fallback
+        self.trigger: Optional[WorkTrigger] = WorkTrigger() if watch else None
+        self.recorder = RunRecorder()
+        self.run_id: Optional[str] = None
         self.running = True
         self.setup_signal_handlers()
 
@@ -39,7 +66,7 @@ class ProcessManager:
 
     def cleanup(self):
         """Clean up all running processes"""
-        processes = [self.dashboard_process, self.current_process]
+        processes = [self.dashboard_process] + list(self.stage_processes)
         for process in processes:
             if process and process.poll() is None:
                 logging.info(f"Terminating process {process.pid}")
@@ -50,25 +77,52 @@ class ProcessManager:
                     logging.warning(f"Process {process.pid} didn't terminate, forcing...")
                     process.kill()
 
-    def run_process(self, script_name: str) -> bool:
-        """Run a Python script and wait for completion"""
+    async def run_isolated(self, stage: PipelineStage) -> int:
+        """Run a stage's script in child processes, one per worker, returning the first failing return code or 0"""
+        env = stage_environment(self.run_id, stage.name)
+        if stage.workers == 1:
+            commands = [[sys.executable, stage.script]]
+        else:
+            commands = [[sys.executable, stage.script, '--worker-id', f"{os.getpid()}-worker-{i + 1}"]
+                        for i in range(stage.workers)]
+        processes = [subprocess.Popen(command, env=env) for command in commands]
+        self.stage_processes.extend(processes)
         try:
-            logging.info(f"Starting {script_name}...")
-            self.current_process = subprocess.Popen([sys.executable, script_name])
-            self.current_process.wait()
-            
-            if self.current_process.returncode == 0:
-                logging.info(f"{script_name} completed successfully")
-                return True
+            return_codes = await asyncio.gather(*(asyncio.to_thread(process.wait) for process in processes))
+        finally:
+            for process in processes:
+                self.stage_processes.remove(process)
+        
+        failed = [code for code in return_codes if code != 0]
+        if failed and stage.workers > 1:
+            logging.error(f"{len(failed)} of {stage.workers} {stage.script} workers failed with return codes {failed}")
+        return failed[0] if failed else 0
+
+    async def run_stage(self, stage: PipelineStage) -> bool:
+        """Run one stage in-process or in child processes, recording it in pipeline_runs"""
+        if not self.running:
+            return False
+        
+        logging.info(f"Starting {stage.script}" + (f" ({stage.workers} workers)" if stage.workers > 1 else "") +
+                     ("..." if self.isolate_stages else " in-process..."))
+        self.recorder.start_stage(stage.name, workers=stage.workers)
+        return_code = None
+        try:
+            if self.isolate_stages:
+                return_code = await self.run_isolated(stage)
+                success = return_code == 0
             else:
-                logging.error(f"{script_name} failed with return code {self.current_process.returncode}")
-                return False
-                
+                success = await self.orchestrator.execute(stage.script, self.run_id, **stage.options)
         except Exception as e:
-            logging.error(f"Error running {script_name}: {e}")
-            return False
-        finally:
-            self.current_process = None
+            logging.error(f"Error running {stage.script}: {e}")
+            success = False
+        self.recorder.finish_stage(stage.name, success, return_code)
+        
+        if success:
+            logging.info(f"{stage.script} completed successfully")
+        elif return_code is not None:
+            logging.error(f"{stage.script} failed with return code {return_code}")
+        return success
 
     def run_dashboard(self):
         """Start the dashboard process"""
@@ -81,20 +135,25 @@ class ProcessManager:
             logging.error(f"Error starting dashboard: {e}")
             self.running = False
 
-    def run_sequence(self):
-        """Run the sequence of scripts"""
-        scripts = ['Gettweets.py', 'screenshots_analyze.py', 'tweet_analyzer.py']
+    def run_sequence(self, scripts: Optional[List[str]] = None):
+        """Run one cycle of the pipeline (or just the given scripts), overlapping independent stages"""
+        stages = select_stages(self.stages, scripts) if scripts else self.stages
+        self.run_id = self.recorder.start_run()
+        logging.info(f"Starting pipeline run {self.run_id}")
         
-        for script in scripts:
-            if not self.running:
-                break
-                
-            if not self.run_process(script):
-                logging.error(f"Error in sequence at {script}")
-                break
-            
-            if not self.running:
-                break
+        if self.isolate_stages:
+            outcomes = asyncio.run(run_stage_graph(stages, self.run_stage))
+        else:
+            if self.orchestrator is None:
+                self.orchestrator = InProcessOrchestrator()
+            outcomes = self.orchestrator.run_stages(stages, self.run_stage)
+        
+        for stage, outcome in outcomes.items():
+            if outcome is None:
+                self.recorder.skip_stage(stage)
+        unsuccessful = [stage for stage, outcome in outcomes.items() if not outcome]
+        if unsuccessful:
+            logging.error(f"Pipeline run {self.run_id} finished without completing: {', '.join(unsuccessful)}")
 
     def get_next_run_time(self) -> datetime.datetime:
         """Generate random time between 1-3 hours from now"""
@@ -109,8 +168,12 @@ class ProcessManager:
         minutes = (total_seconds % 3600) // 60
         return f"{hours} hours, {minutes} minutes"
 
-    def wait_until_next_run(self, next_run: datetime.datetime):
-        """Wait until next run with 5-minute countdown updates"""
+    def wait_until_next_run(self, next_run: datetime.datetime) -> Set[str]:
+        """Wait until next run with 5-minute countdown updates.
+
+        With a trigger, returns early with the kinds of new work that arrived;
+        an empty set means the scheduled time was reached.
+        """
         last_update = datetime.datetime.now()
         update_interval = datetime.timedelta(minutes=5)
         
@@ -123,8 +186,14 @@ class ProcessManager:
                 logging.info(f"Time until next run: {self.format_timedelta(time_remaining)}")
                 last_update = current_time
             
-            # Sleep for 30 seconds between checks
-            time.sleep(30)
+            if self.trigger is not None:
+                work = self.trigger.wait(timeout=min(30, (next_run - current_time).total_seconds()))
+                if work:
+                    return work
+            else:
+                # Sleep for 30 seconds between checks
+                time.sleep(30)
+        return set()
 
     def run(self):
         """Main execution loop"""
@@ -133,29 +202,54 @@ class ProcessManager:
             self.run_dashboard()
             if not self.running:
                 return
+            if self.trigger is not None:
+                self.trigger.start()
 
             # First immediate run
             logging.info("Starting initial sequence run")
             self.run_sequence()
 
             # Continue with timed runs
+            next_run = None
             while self.running:
-                next_run = self.get_next_run_time()
-                logging.info(f"Next run scheduled for: {next_run.strftime('%Y-%m-%d %H:%M:%S')} "
-                           f"({self.format_timedelta(next_run - datetime.datetime.now())} from now)")
+                if next_run is None:
+                    next_run = self.get_next_run_time()
+                    logging.info(f"Next run scheduled for: {next_run.strftime('%Y-%m-%d %H:%M:%S')} "
+                               f"({self.format_timedelta(next_run - datetime.datetime.now())} from now)")
                 
-                # Wait until next run with status updates
-                self.wait_until_next_run(next_run)
+                # Wait until next run with status updates, or until new work arrives
+                work = self.wait_until_next_run(next_run)
                 
-                if self.running:
+                if self.running and work:
+                    logging.info(f"New {' and '.join(sorted(work))} detected, starting triggered run")
+                    self.run_sequence([self.TRIGGERED_STAGES[kind] for kind in sorted(work)])
+                elif self.running:
                     logging.info("Starting scheduled sequence run")
                     self.run_sequence()
+                    next_run = None
 
         except Exception as e:
             logging.error(f"Error in main loop: {e}")
         finally:
             self.cleanup()
+            if self.trigger is not None:
+                self.trigger.stop()
+            if self.orchestrator is not None:
+                self.orchestrator.close()
+            self.recorder.close()
 
 if __name__ == "__main__":
-    manager = ProcessManager()
+    parser = argparse.ArgumentParser(description="Run the dashboard and the scrape/analysis pipeline")
+    parser.add_argument('--analyzer-workers', type=int, default=1,
+                        help="Number of tweet_analyzer.py workers to run in parallel "
+                             "(in-process, their batches share one analyzer)")
+    parser.add_argument('--isolate-stages', action='store_true',
+                        help="Run each stage in its own Python process instead of in-process")
+    parser.add_argument('--watch', action='store_true',
+                        help="Analyze new screenshots and tweets within seconds of their arrival, "
+                             "keeping the random 1-3 hour schedule for full runs")
+    args = parser.parse_args()
+    
+    manager = ProcessManager(analyzer_workers=args.analyzer_workers, isolate_stages=args.isolate_stages,
+                             watch=args.watch)
     manager.run()
\ No newline at end of file
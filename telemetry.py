@@ -0,0 +1,140 @@
+import logging
+import os
+import subprocess
+import time
+import uuid
+from database import migrate, bump_data_version, SharedConnection
+
+# ProcessManager hands the run and stage to each stage script through these
+RUN_ID_ENV = 'PIPELINE_RUN_ID'
+STAGE_ENV = 'PIPELINE_STAGE'
+
+# Counters a stage reports; several workers of one stage add into the same row
+STAGE_COUNTERS = ['items_processed', 'failures', 'llm_requests', 'retries',
+                  'prompt_tokens', 'completion_tokens']
+
+
+def new_run_id():
+    """Sortable, unique id for one pass through the pipeline"""
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+
+
+def stage_name(script_name):
+    """Stage name recorded for a script, e.g. ``tweet_analyzer`` for tweet_analyzer.py"""
+    return os.path.splitext(os.path.basename(script_name))[0]
+
+
+def code_version():
+    """Short git commit of the running code, or None outside a checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def stage_environment(run_id, stage):
+    """Environment for a stage's child process, tagged with its run and stage"""
+    env = dict(os.environ)
+    env[RUN_ID_ENV] = run_id
+    env[STAGE_ENV] = stage
+    return env
+
+
+def record_stage_usage(db, counters, run_id=None, stage=None):
+    """Add a stage's counters to its pipeline_runs row.
+
+    The run and stage default to the ones ProcessManager passed down, so this
+    is a no-op when a script is run by hand. Telemetry never fails a stage.
+    """
+    run_id = run_id or os.environ.get(RUN_ID_ENV)
+    stage = stage or os.environ.get(STAGE_ENV)
+    if not run_id or not stage:
+        return
+
+    values = [int(counters.get(name) or 0) for name in STAGE_COUNTERS]
+    columns = ', '.join(STAGE_COUNTERS)
+    updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in STAGE_COUNTERS)
+    try:
+        with db.transaction() as cursor:
+            cursor.execute(f'''
+                INSERT INTO pipeline_runs (run_id, stage, {columns})
+                VALUES (?, ?, {', '.join('?' * len(STAGE_COUNTERS))})
+                ON CONFLICT (run_id, stage) DO UPDATE SET {updates}
+            ''', [run_id, stage] + values)
+            bump_data_version(cursor)
+    except Exception as e:
+        logging.error(f"Error recording telemetry for {stage} in run {run_id}: {e}")
+
+
+class RunRecorder:
+    """Records the start, end and outcome of each stage of a pipeline run.
+
+    The stage scripts add their own counters to the same row through
+    ``record_stage_usage``.
+    """
+
+    def __init__(self, db_file="twitter_data.db"):
+        self.DB_FILE = db_file
+        migrate(db_file)
+        self.db = SharedConnection(db_file)
+        self.version = code_version()
+        self.run_id = None
+        self.started = {}
+
+    def start_run(self):
+        """Begin a new run and return its id"""
+        self.run_id = new_run_id()
+        self.started = {}
+        return self.run_id
+
+    def start_stage(self, stage, workers=1):
+        self.started[stage] = time.time()
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO pipeline_runs (run_id, stage, code_version, workers, started_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (run_id, stage) DO UPDATE SET
+                        code_version = excluded.code_version,
+                        workers = excluded.workers,
+                        started_at = excluded.started_at
+                ''', (self.run_id, stage, self.version, workers, self.started[stage]))
+                bump_data_version(cursor)
+        except Exception as e:
+            logging.error(f"Error recording start of {stage} in run {self.run_id}: {e}")
+
+    def finish_stage(self, stage, succeeded, return_code=None):
+        finished = time.time()
+        started = self.started.get(stage, finished)
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE pipeline_runs
+                    SET status = ?, return_code = ?, finished_at = ?, duration_seconds = ?
+                    WHERE run_id = ? AND stage = ?
+                ''', ('succeeded' if succeeded else 'failed', return_code, finished,
+                      finished - started, self.run_id, stage))
+                bump_data_version(cursor)
+        except Exception as e:
+            logging.error(f"Error recording end of {stage} in run {self.run_id}: {e}")
+
+    def skip_stage(self, stage):
+        """Record a stage that did not run because a stage it depends on failed"""
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO pipeline_runs (run_id, stage, code_version, status)
+                    VALUES (?, ?, ?, 'skipped')
+                    ON CONFLICT (run_id, stage) DO UPDATE SET status = 'skipped'
+                ''', (self.run_id, stage, self.version))
+                bump_data_version(cursor)
+        except Exception as e:
+            logging.error(f"Error recording skipped {stage} in run {self.run_id}: {e}")
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,55 @@
+import pytest
+
+from analysis_cache import AnalysisCache
+from database import SharedConnection, migrate
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    db = SharedConnection(path)
+    yield lambda **kwargs: AnalysisCache(path, db=db, **kwargs)
+    db.close()
+
+
+def tweets(*ids):
+    return [(str(i), {'text': f"tweet number {i}"}) for i in ids]
+
+
+def analyses(*ids, summary='summary'):
+    return [{'id': str(i), 'summary': summary, 'sentiment': 'neutral', 'category': 'news'} for i in ids]
+
+
+def entries(cache):
+    with cache.db.transaction() as cursor:
+        cursor.execute('SELECT summary, created_at, last_used_at, hit_count FROM analysis_cache')
+        return cursor.fetchall()
+
+
+def test_storing_again_keeps_usage_counters(make_cache):
+    cache = make_cache()
+    cache.store(tweets(1), analyses(1))
+    cached, uncached = cache.lookup(tweets(1))
+    assert [result['id'] for result in cached] == ['1'] and uncached == []
+    [(_, created_at, last_used_at, hit_count)] = entries(cache)
+    assert hit_count == 1
+
+    cache.store(tweets(1), analyses(1, summary='newer summary'))
+    assert entries(cache) == [('newer summary', created_at, last_used_at, 1)]
+
+
+def test_eviction_runs_every_evict_every_rows(make_cache):
+    cache = make_cache(max_entries=2, evict_every=3)
+    for tweet_id in (1, 2, 3):
+        cache.store(tweets(tweet_id), analyses(tweet_id))
+    assert len(entries(cache)) == 2
+    assert cache.stored_since_evict == 0
+
+    cache.store(tweets(4, 5), analyses(4, 5))
+    assert len(entries(cache)) == 4
+    cache.lookup(tweets(2))
+    cache.store(tweets(6), analyses(6))
+    # Least recently used first: 2 was just looked up and 6 was just stored
+    cached, _ = cache.lookup(tweets(*range(1, 7)))
+    assert sorted(result['id'] for result in cached) == ['2', '6']
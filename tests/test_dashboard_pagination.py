@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('flask')
+from werkzeug.datastructures import MultiDict
+
+from dashboard import InvalidArgument, decode_cursor, encode_cursor, recent_tweets
+from database import migrate
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = [(f"t{i:02d}", 'author', f"text {i}", f"2024-01-{i % 28 + 1:02d}T00:00:00",
+             'happy' if i % 2 else 'sad') for i in range(20)]
+    # Timestamps that cannot be parsed leave timestamp_epoch NULL
+    rows += [(f"u{i:02d}", 'author', f"undated {i}", 'yesterday', 'happy' if i % 2 else 'sad')
+             for i in range(5)]
+    conn.executemany('INSERT INTO tweets (tweet_id, author, text, timestamp, sentiment) VALUES (?, ?, ?, ?, ?)',
+                     rows)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def all_pages(conn, **args):
+    seen, cursor = [], None
+    while True:
+        params = MultiDict(args)
+        if cursor:
+            params['cursor'] = cursor
+        page = recent_tweets(conn.cursor(), params)
+        seen += [tweet['tweet_id'] for tweet in page['tweets']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return seen
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1704067200, 't01')) == (1704067200, 't01')
+    assert decode_cursor(encode_cursor(None, 'u01'), types=((int, type(None)), str)) == (None, 'u01')
+
+
+@pytest.mark.parametrize('value', ['not base64!', encode_cursor('1', 't01'), encode_cursor(1),
+                                   encode_cursor(None, 'u01')])
+def test_invalid_cursors_are_rejected(value):
+    with pytest.raises(InvalidArgument):
+        decode_cursor(value)
+
+
+@pytest.mark.parametrize('limit', ['1', '3', '7', '100'])
+def test_pages_list_every_tweet_once_with_undated_last(conn, limit):
+    expected = [row['tweet_id'] for row in conn.execute(
+        'SELECT tweet_id FROM tweets ORDER BY timestamp_epoch IS NULL, timestamp_epoch DESC, tweet_id DESC')]
+    assert all_pages(conn, limit=limit) == expected
+    assert expected[-5:] == ['u04', 'u03', 'u02', 'u01', 'u00']
+
+
+def test_filters_apply_to_undated_tweets(conn):
+    seen = all_pages(conn, limit='4', sentiment='happy')
+    assert len(seen) == 12
+    assert seen[-2:] == ['u03', 'u01']
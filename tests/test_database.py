@@ -0,0 +1,111 @@
+import sqlite3
+
+from database import (LATEST_VERSION, MIGRATIONS, SharedConnection, bump_data_version, get_data_version,
+                      get_schema_version, migrate, migration_001_base_schema, update_rollups)
+
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"))
+    finally:
+        conn.close()
+
+
+def test_migrate_fresh_database_twice_is_idempotent(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    assert migrate(path) == LATEST_VERSION
+    first = schema(path)
+    assert migrate(path) == LATEST_VERSION
+    assert schema(path) == first
+
+    conn = sqlite3.connect(path)
+    versions = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(conn.cursor()) == LATEST_VERSION
+    conn.close()
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+
+
+def legacy_database(path):
+    """A database created before the migrations, with analyzed tweets already in it"""
+    conn = sqlite3.connect(path)
+    migration_001_base_schema(conn.cursor())
+    conn.executemany('''
+        INSERT INTO tweets (tweet_id, author, text, timestamp, url, processed, sentiment, category)
+        VALUES (?, 'author', 'text', ?, '', TRUE, 'happy', 'news')
+    ''', [('1', '2024-01-01T10:00:00Z'), ('2', '2024-01-01 11:30:00'), ('3', 'not a date')])
+    conn.commit()
+    conn.close()
+
+
+def test_upgrade_backfills_rollups(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    legacy_database(path)
+    migrate(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute('''
+        SELECT bucket, count FROM sentiment_rollups WHERE resolution = 'day'
+    ''').fetchall() == [('2024-01-01', 2)]
+    conn.close()
+
+
+def test_update_rollups_counts_newly_analyzed_tweets(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    db = SharedConnection(path)
+    with db.transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO tweets (tweet_id, author, text, timestamp, url)
+            VALUES ('1', 'author', 'text', '2024-02-03T04:05:06', '')
+        ''')
+        cursor.execute("UPDATE tweets SET processed = TRUE, category = 'news' WHERE tweet_id = '1'")
+        update_rollups(cursor, ['1'])
+        cursor.execute("SELECT resolution, bucket, count FROM category_rollups ORDER BY resolution")
+        assert cursor.fetchall() == [('day', '2024-02-03', 1), ('hour', '2024-02-03 04:00:00', 1),
+                                     ('week', '2024-01-29', 1)]
+    db.close()
+
+
+def test_upgrade_backfills_epoch_timestamps(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    legacy_database(path)
+    migrate(path)
+    conn = sqlite3.connect(path)
+    epochs = dict(conn.execute('SELECT tweet_id, timestamp_epoch FROM tweets'))
+    assert epochs == {'1': 1704103200, '2': 1704108600, '3': None}
+    conn.close()
+
+
+def test_epoch_column_follows_inserts_and_updates(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        INSERT INTO tweets (tweet_id, author, text, timestamp, url)
+        VALUES ('1', 'author', 'text', '2024-02-03T04:05:06', '')
+    ''')
+    assert conn.execute("SELECT timestamp_epoch FROM tweets WHERE tweet_id = '1'").fetchone()[0] == 1706933106
+    conn.execute("UPDATE tweets SET timestamp = '2024-02-03T04:05:07+01:00' WHERE tweet_id = '1'")
+    assert conn.execute("SELECT timestamp_epoch FROM tweets WHERE tweet_id = '1'").fetchone()[0] == 1706929507
+    conn.close()
+
+
+def test_data_version_counts_scraper_inserts_and_pipeline_writes(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    db = SharedConnection(path)
+    with db.transaction() as cursor:
+        before = get_data_version(cursor)
+        cursor.execute('''
+            INSERT INTO tweets (tweet_id, author, text, timestamp, url)
+            VALUES ('1', 'author', 'text', '2024-02-03T04:05:06', '')
+        ''')
+        assert get_data_version(cursor) == before + 1
+        bump_data_version(cursor)
+        assert get_data_version(cursor) == before + 2
+    db.close()
@@ -0,0 +1,44 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from image_prep import ImageSettings, encode_image, model_size, target_size, vision_tiles
+
+
+def test_model_size_matches_vision_rescaling():
+    assert model_size(1260, 1600) == (768, 975)
+    assert model_size(4096, 1024) == (2048, 512)
+    assert model_size(400, 300) == (400, 300)
+
+
+@pytest.mark.parametrize('max_tiles', [4, 2, 1])
+def test_tile_budget_is_respected(max_tiles):
+    width, height = target_size(1260, 1600, max_tiles=max_tiles)
+    assert vision_tiles(width, height) <= max_tiles
+
+
+@pytest.mark.parametrize('size, max_tiles', [((400, 300), 0), ((400, 300), -1), ((1260, 1600), 0),
+                                             ((300, 400), 0.5)])
+def test_budget_under_one_tile_falls_back_to_a_single_tile(size, max_tiles):
+    width, height = target_size(*size, max_tiles=max_tiles)
+    assert vision_tiles(width, height) == 1
+
+
+def test_max_dimension_caps_longest_side():
+    assert max(target_size(1260, 1600, max_dimension=512)) == 512
+
+
+@pytest.mark.parametrize('image_format, mime_type', [('JPEG', 'image/jpeg'), ('WEBP', 'image/webp'),
+                                                     ('PNG', 'image/png')])
+def test_encode_image_round_trips_in_memory(image_format, mime_type):
+    image = Image.new('RGBA', (1260, 1600), 'white')
+    encoded = encode_image(image, ImageSettings(image_format, 80))
+    assert encoded.mime_type == mime_type
+    assert (encoded.width, encoded.height) == (768, 975)
+    data = base64.b64decode(encoded.data)
+    assert len(data) == encoded.size
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.format == image_format
+        assert decoded.size == (768, 975)
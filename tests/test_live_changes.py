@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('flask')
+
+from dashboard import LiveChanges
+from database import migrate, update_rollups
+
+
+class RecordingCursor:
+    """Cursor that remembers every statement it runs"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self.cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executemany('''
+        INSERT INTO tweets (tweet_id, author, text, timestamp, url, processed, sentiment, category)
+        VALUES (?, ?, 'text', ?, '', TRUE, ?, ?)
+    ''', [(str(i), f"author{i % 3}", f"2024-01-{i % 20 + 1:02d}T12:00:00",
+           ['happy', 'sad', 'angry'][i % 3], ['news', 'opinion'][i % 2]) for i in range(30)])
+    update_rollups(conn.cursor(), [str(i) for i in range(30)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_snapshot_matches_the_tweets_table(conn):
+    state = LiveChanges().snapshot(conn.cursor())
+    assert state['stats']['total_tweets'] == 30
+    assert state['sentiment_counts'] == dict(conn.execute(
+        'SELECT sentiment, COUNT(*) FROM tweets GROUP BY sentiment').fetchall())
+    assert state['category_counts'] == dict(conn.execute(
+        'SELECT category, COUNT(*) FROM tweets GROUP BY category').fetchall())
+
+
+def test_snapshot_never_scans_tweets(conn):
+    cursor = RecordingCursor(conn.cursor())
+    LiveChanges().snapshot(cursor)
+    for sql, params in cursor.statements:
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        assert not any(detail.startswith('SCAN tweets') for detail in plan), (sql, plan)
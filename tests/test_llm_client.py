@@ -0,0 +1,89 @@
+import asyncio
+import io
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+from llm_client import AuthenticationError, LLMClient
+
+VALID_KEY = 'good-key'
+
+
+class Terminal(io.StringIO):
+    """Stand-in for sys.stdin that may or may not be a TTY"""
+
+    def __init__(self, tty):
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+async def completions(request):
+    if request.headers['Authorization'] != f"Bearer {VALID_KEY}":
+        return web.json_response({'error': 'invalid key'}, status=401)
+    return web.json_response({'choices': [{'message': {'content': '{}'}}],
+                              'usage': {'prompt_tokens': 1, 'completion_tokens': 1}})
+
+
+async def with_server(run):
+    app = web.Application()
+    app.router.add_post('/chat/completions', completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await run(f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def prompts(tmp_path, monkeypatch):
+    """Answers to the API key prompt, recording when it is asked"""
+    monkeypatch.chdir(tmp_path)
+    asked = []
+
+    def answer(prompt):
+        asked.append(prompt)
+        return VALID_KEY
+
+    monkeypatch.setattr('builtins.input', answer)
+    return asked
+
+
+def request_all(count, tty, monkeypatch):
+    monkeypatch.setattr('sys.stdin', Terminal(tty))
+
+    async def run(base_url):
+        async with LLMClient(api_key='bad-key', base_url=base_url) as client:
+            messages = [{'role': 'user', 'content': 'hi'}]
+            return await asyncio.gather(*(client.chat_completion(messages) for _ in range(count)),
+                                        return_exceptions=True)
+
+    return asyncio.run(with_server(run))
+
+
+def test_rejected_key_fails_the_request_without_a_terminal(prompts, monkeypatch):
+    results = request_all(2, tty=False, monkeypatch=monkeypatch)
+    assert all(isinstance(result, AuthenticationError) for result in results)
+    assert prompts == []
+
+
+def test_rejected_key_is_prompted_for_once_across_concurrent_requests(prompts, monkeypatch):
+    results = request_all(3, tty=True, monkeypatch=monkeypatch)
+    assert all(isinstance(result, dict) for result in results)
+    assert len(prompts) == 1
+    with open('openai_key.txt') as f:
+        assert f.read() == VALID_KEY
+
+
+def test_missing_key_without_a_terminal_raises(prompts, monkeypatch):
+    monkeypatch.setattr('sys.stdin', Terminal(False))
+    with pytest.raises(AuthenticationError):
+        LLMClient()
+    assert prompts == []
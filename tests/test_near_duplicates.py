@@ -0,0 +1,101 @@
+from near_duplicates import (NearDuplicateClusterer, NearDuplicateIndex, hamming_distance,
+                             normalize_for_similarity, simhash)
+
+TEMPLATE = "Huge giveaway today, retweet and follow to win a brand new phone before midnight"
+
+
+def tweets(*ids, text=TEMPLATE):
+    return [(str(tweet_id), {'text': f"@user{tweet_id} {text} https://t.co/{tweet_id}"}) for tweet_id in ids]
+
+
+def analysis(tweet_id):
+    return {'id': tweet_id, 'summary': 'giveaway', 'sentiment': 'positive', 'category': 'promo'}
+
+
+def test_normalize_strips_handles_urls_and_punctuation():
+    assert normalize_for_similarity("@bob Check THIS out!! https://x.co/abc #wow") == "check this out wow"
+
+
+def test_normalize_keeps_emoji_as_tokens():
+    assert normalize_for_similarity("😡😡😡 @politician") == "😡 😡 😡"
+    assert normalize_for_similarity("❤️❤️ @friend") == "❤ ❤"
+    assert normalize_for_similarity("https://t.co/a1") == ""
+
+
+def test_templated_posts_share_a_fingerprint():
+    first, second = tweets(1, 2)
+    assert hamming_distance(simhash(first[1]['text']), simhash(second[1]['text'])) == 0
+    assert simhash('') == 0
+
+
+def test_index_finds_close_fingerprints_only():
+    index = NearDuplicateIndex(max_distance=3)
+    index.add('a', 0b1011)
+    assert index.find(0b1011 ^ 0b111) == 'a'
+    assert index.find(0b1011 ^ 0b1111) is None
+    index.remove('a')
+    assert index.find(0b1011) is None
+    assert len(index) == 0
+
+
+def test_followers_get_representative_labels():
+    clusterer = NearDuplicateClusterer()
+    copied, representatives, followers = clusterer.cluster(tweets(1, 2, 3))
+    assert copied == []
+    assert [tweet_id for tweet_id, _ in representatives] == ['1']
+    assert followers == {'1': ['2', '3']}
+
+    results = clusterer.propagate([analysis('1')], followers)
+    assert [result['id'] for result in results] == ['2', '3']
+
+    copied, representatives, followers = clusterer.cluster(tweets(4))
+    assert [result['id'] for result in copied] == ['4']
+    assert representatives == []
+
+
+def test_failed_representative_hands_cluster_to_next_tweet():
+    clusterer = NearDuplicateClusterer()
+    clusterer.cluster(tweets(1, 2, 3))
+    # Representative 1 failed, so propagate never saw it
+    clusterer.propagate([], {'1': ['2', '3']})
+
+    copied, representatives, followers = clusterer.cluster(tweets(2, 3, 4, 5))
+    assert copied == []
+    assert [tweet_id for tweet_id, _ in representatives] == ['2']
+    assert followers == {'2': ['3', '4', '5']}
+
+    clusterer.propagate([analysis('2')], followers)
+    copied, representatives, _ = clusterer.cluster(tweets(6))
+    assert [result['id'] for result in copied] == ['6']
+    assert representatives == []
+
+
+def test_least_recently_matched_representatives_are_evicted():
+    clusterer = NearDuplicateClusterer(max_entries=2)
+    texts = ["first completely different message about cooking pasta at home tonight",
+             "second unrelated post on football results from the weekend league",
+             "third note regarding stock market volatility and interest rate moves"]
+    for tweet_id, text in enumerate(texts):
+        _, _, followers = clusterer.cluster(tweets(tweet_id, text=text))
+        clusterer.propagate([analysis(str(tweet_id))], followers)
+
+    assert len(clusterer.index) == 2
+    assert '0' not in clusterer.index and '0' not in clusterer.labels
+    assert set(clusterer.labels) == {'1', '2'}
+
+
+def test_short_tweets_go_straight_to_the_model():
+    clusterer = NearDuplicateClusterer()
+    short = [('1', {'text': "😡😡😡 @politician"}), ('2', {'text': "❤️❤️ @friend"}),
+             ('3', {'text': "https://t.co/a1"}), ('4', {'text': "https://t.co/b2"})]
+    copied, representatives, followers = clusterer.cluster(short)
+    assert copied == []
+    assert [tweet_id for tweet_id, _ in representatives] == ['1', '2', '3', '4']
+    assert followers == {'1': [], '2': [], '3': [], '4': []}
+    assert len(clusterer.index) == 0
+
+    # Their labels are never reused, even for an identical later tweet
+    clusterer.propagate([analysis(tweet_id) for tweet_id in ['1', '2', '3', '4']], followers)
+    copied, representatives, _ = clusterer.cluster([('5', {'text': "😡😡😡 @politician"})])
+    assert copied == []
+    assert [tweet_id for tweet_id, _ in representatives] == ['5']
@@ -0,0 +1,74 @@
+import asyncio
+import signal
+import time
+
+import pytest
+
+from orchestrator import PipelineStage, run_stage_graph, select_stages
+
+# A capture stage feeding two analyzers that do not depend on each other
+STAGES = [
+    PipelineStage('capture.py'),
+    PipelineStage('vision.py', depends_on=['capture.py']),
+    PipelineStage('analyze.py', depends_on=['capture.py']),
+]
+
+
+def runner(outcomes, delay=0.0, log=None):
+    async def run_stage(stage):
+        if log is not None:
+            log.append(stage.name)
+        await asyncio.sleep(delay)
+        outcome = outcomes.get(stage.name, True)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return run_stage
+
+
+def test_all_stages_succeed_in_dependency_order():
+    log = []
+    result = asyncio.run(run_stage_graph(STAGES, runner({}, log=log)))
+    assert result == {'capture': True, 'vision': True, 'analyze': True}
+    assert log[0] == 'capture'
+
+
+def test_failed_stage_skips_its_dependents():
+    log = []
+    result = asyncio.run(run_stage_graph(STAGES, runner({'capture': False}, log=log)))
+    assert result == {'capture': False, 'vision': None, 'analyze': None}
+    assert log == ['capture']
+
+
+def test_failure_of_one_analyzer_does_not_stop_the_other():
+    result = asyncio.run(run_stage_graph(STAGES, runner({'vision': RuntimeError('boom')})))
+    assert result == {'capture': True, 'vision': False, 'analyze': True}
+
+
+def test_independent_stages_overlap():
+    start = time.perf_counter()
+    asyncio.run(run_stage_graph(STAGES, runner({}, delay=0.2)))
+    assert time.perf_counter() - start < 0.55
+
+
+def test_dependencies_must_be_listed_first():
+    with pytest.raises(ValueError):
+        asyncio.run(run_stage_graph(list(reversed(STAGES)), runner({})))
+
+
+def test_select_stages_drops_dependencies_outside_the_selection():
+    selected = select_stages(STAGES, ['analyze.py'])
+    assert [stage.name for stage in selected] == ['analyze']
+    assert selected[0].depends_on == []
+
+
+def test_pipeline_stages_do_not_wait_for_each_other(tmp_path, monkeypatch):
+    # start logs to a file in the working directory and installs signal handlers
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(signal, 'signal', lambda signum, handler: None)
+    from start import ProcessManager
+
+    stages = ProcessManager(analyzer_workers=2).stages
+    assert {stage.name: stage.depends_on for stage in stages} == {
+        'Gettweets': [], 'screenshots_analyze': [], 'tweet_analyzer': []}
+    assert [stage.workers for stage in stages] == [1, 1, 2]
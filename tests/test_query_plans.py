@@ -0,0 +1,113 @@
+import re
+import sqlite3
+
+import pytest
+
+pytest.importorskip('flask')
+from werkzeug.datastructures import MultiDict
+
+from dashboard import (DASHBOARD_PANELS, LiveChanges, encode_cursor, search_tweets,
+                       top_recommendations)
+from database import migrate
+
+DATE_RANGE = {'start_date': '2024-01-01', 'end_date': '2024-01-31'}
+DEEP_PAGE = {'cursor': encode_cursor(1_700_000_000, '1700000000000000000')}
+UNDATED_PAGE = {'cursor': encode_cursor(None, '1700000000000000000')}
+
+# A plan step that reads every row of tweets, under its name or the search alias
+TWEETS_SCAN = re.compile(r'^SCAN (tweets|t)\b')
+
+
+class ExplainingCursor:
+    """Cursor that records the query plan of every statement before running it"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.plans = []
+
+    def execute(self, sql, params=()):
+        if sql.strip() != 'BEGIN':
+            plan = [row[3] for row in self.cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            self.plans.append((' '.join(sql.split()), plan))
+        return self.cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def panel(name, **args):
+    return lambda cursor: DASHBOARD_PANELS[name](cursor, MultiDict(args))
+
+
+def live_snapshot(cursor):
+    LiveChanges().snapshot(cursor)
+
+
+def live_trends(cursor):
+    changes = LiveChanges()
+    changes.new_trends(cursor)
+    changes.new_trends(cursor)
+
+
+# (call, indexes its plans must use, why it may sort in a temp b-tree or None).
+# Only queries ordered by an aggregate may sort: the order is computed, not stored.
+QUERIES = {
+    'stats': (panel('stats'), ['idx_authors_tweet_count', 'idx_tweets_epoch_id'], None),
+    'sentiment_counts': (panel('sentiment_counts'), ['USING PRIMARY KEY (resolution=?)'],
+                         'ordered by the summed count of a handful of labels'),
+    'category_counts': (panel('category_counts'), ['USING PRIMARY KEY (resolution=?)'],
+                        'ordered by the summed count of a handful of labels'),
+    'sentiment_timeline': (panel('sentiment_timeline', **DATE_RANGE),
+                           ['USING PRIMARY KEY (resolution=? AND bucket>? AND bucket<?)'], None),
+    'category_timeline': (panel('category_timeline', **DATE_RANGE),
+                          ['USING PRIMARY KEY (resolution=? AND bucket>? AND bucket<?)'], None),
+    'trends': (panel('trends', **DATE_RANGE), ['idx_trending_topics_timestamp_epoch'],
+               'ordered by the per-topic count'),
+    'filters': (panel('filters'), ['idx_tweets_sentiment_epoch_id', 'idx_tweets_category_epoch_id'], None),
+    'tweets first page': (panel('tweets'), ['idx_tweets_epoch_id'], None),
+    'tweets deep page': (panel('tweets', **DEEP_PAGE), ['idx_tweets_epoch_id'], None),
+    'tweets by sentiment': (panel('tweets', sentiment='hateful', **DEEP_PAGE),
+                           ['idx_tweets_sentiment_epoch_id'], None),
+    'tweets by category': (panel('tweets', category='news', **DEEP_PAGE),
+                          ['idx_tweets_category_epoch_id'], None),
+    'tweets undated page': (panel('tweets', sentiment='hateful', **UNDATED_PAGE),
+                            ['idx_tweets_sentiment_epoch_id'], None),
+    'author_frequencies': (panel('author_frequencies'), ['idx_authors_tweet_count'], None),
+    'pipeline_runs': (panel('pipeline_runs'), ['sqlite_autoindex_pipeline_runs_1'],
+                      'runs ordered by their earliest stage start'),
+    'recommendations': (top_recommendations, ['idx_follow_recommendations_timestamp_epoch'],
+                        'ordered by how often each account was recommended'),
+    'search': (lambda cursor: search_tweets(cursor, MultiDict({'q': 'election', 'sentiment': 'hateful'})),
+               ['VIRTUAL TABLE', 'USING INTEGER PRIMARY KEY'],
+               'ordered by bm25 rank, which is computed per match'),
+    'live snapshot': (live_snapshot, ['idx_authors_tweet_count', 'idx_tweets_epoch_id',
+                                      'USING PRIMARY KEY (resolution=? AND bucket>?)'],
+                      'label counts are ordered by their summed count'),
+    'live trends': (live_trends, ['USING INTEGER PRIMARY KEY (rowid>?)'], None),
+}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_dashboard_query_uses_expected_index(conn, name):
+    call, indexes, sort_reason = QUERIES[name]
+    cursor = ExplainingCursor(conn.cursor())
+    call(cursor)
+
+    assert cursor.plans
+    steps = [step for _, plan in cursor.plans for step in plan]
+    for index in indexes:
+        assert any(index in step for step in steps), (index, cursor.plans)
+    for sql, plan in cursor.plans:
+        assert not any(TWEETS_SCAN.match(step) for step in plan), (sql, plan)
+        if sort_reason is None:
+            assert not any('USE TEMP B-TREE' in step for step in plan), (sql, plan)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from database import SCREENSHOT_ANALYZERS, SharedConnection, migrate
+
+SCREENSHOT = 'timeline_20240101_120000.png'
+
+
+class VisionClient:
+    """Answers every vision request with one trend and one recommendation"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def usage_stats(self):
+        return {'llm_requests': self.requests, 'retries': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def usage_since(self, baseline):
+        return {name: value - baseline[name] for name, value in self.usage_stats().items()}
+
+    async def chat_completion(self, messages, **kwargs):
+        self.requests += 1
+        content = json.dumps({
+            'trends': [{'topic': 'Election', 'category': 'Politics', 'tweet_volume': 1000}],
+            'recommendations': [{'username': '@someone', 'display_name': 'Someone', 'description': ''}]
+        })
+        return {'choices': [{'finish_reason': 'stop', 'message': {'content': content}}]}
+
+
+@pytest.fixture
+def analyzers(tmp_path, monkeypatch):
+    """Both screenshot analyzer modules, run from a directory holding one screenshot"""
+    Image = pytest.importorskip('PIL.Image')
+    pytest.importorskip('pytz')
+    # The analyzers log to files in the working directory and read screenshots/ from it
+    monkeypatch.chdir(tmp_path)
+    migrate('twitter_data.db')
+    os.makedirs('screenshots')
+    Image.new('RGB', (1920, 1600), 'white').save(os.path.join('screenshots', SCREENSHOT))
+    import Gettweets
+    import screenshots_analyze
+    db = SharedConnection('twitter_data.db')
+    yield {'Gettweets': Gettweets, 'screenshots_analyze': screenshots_analyze}, db
+    db.close()
+
+
+def done_marks(db):
+    with db.transaction(immediate=False) as cursor:
+        cursor.execute("SELECT analyzer FROM processed_screenshots WHERE screenshot = ? AND status = 'done'",
+                       (SCREENSHOT,))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def test_registered_analyzers_match_their_stage_names(analyzers):
+    modules, db = analyzers
+    assert set(SCREENSHOT_ANALYZERS) == set(modules)
+    for name, module in modules.items():
+        assert module.ScreenshotAnalyzer(client=VisionClient(), db=db).ANALYZER == name
+
+
+def test_screenshot_is_kept_until_both_analyzers_are_done(analyzers):
+    modules, db = analyzers
+    path = os.path.join('screenshots', SCREENSHOT)
+
+    asyncio.run(modules['screenshots_analyze'].main(client=VisionClient(), db=db))
+    assert done_marks(db) == {'screenshots_analyze'}
+    assert os.path.exists(path)
+    # Done for screenshots_analyze only: skipped by it, still pending for Gettweets
+    rerun = modules['screenshots_analyze'].ScreenshotAnalyzer(client=VisionClient(), db=db)
+    assert rerun.get_pending_screenshots() == []
+    assert os.path.exists(path)
+
+    client = VisionClient()
+    asyncio.run(modules['Gettweets'].main(client=client, db=db))
+    assert client.requests == 1
+    assert done_marks(db) == {'screenshots_analyze', 'Gettweets'}
+    assert not os.path.exists(path)
+
+
+def test_analyzers_running_together_both_see_the_screenshot(analyzers):
+    modules, db = analyzers
+    clients = {name: VisionClient() for name in modules}
+
+    async def run_both():
+        await asyncio.gather(*(module.main(client=clients[name], db=db) for name, module in modules.items()))
+
+    asyncio.run(run_both())
+    assert {name: client.requests for name, client in clients.items()} == {'Gettweets': 1, 'screenshots_analyze': 1}
+    assert done_marks(db) == set(SCREENSHOT_ANALYZERS)
+    assert not os.path.exists(os.path.join('screenshots', SCREENSHOT))
+    with db.transaction(immediate=False) as cursor:
+        cursor.execute('SELECT COUNT(*) FROM trending_topics WHERE screenshot_ref = ?', (SCREENSHOT,))
+        assert cursor.fetchone()[0] == 2
@@ -0,0 +1,48 @@
+from token_batcher import TokenBudgetBatcher, estimate_tokens
+
+
+def tweets(count, text='short tweet'):
+    return [(str(i), {'id': str(i), 'text': text, 'author': 'a', 'timestamp': '2024-01-01'}) for i in range(count)]
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+
+
+def test_pack_takes_longest_prefix_within_budgets():
+    batcher = TokenBudgetBatcher(max_completion_tokens=500)
+    batch = batcher.pack(tweets(50))
+    assert 0 < len(batch) < 50
+    assert batch == tweets(50)[:len(batch)]
+    completion = batcher.completion_overhead_tokens + sum(
+        batcher.estimate_completion_tokens(tweet) for _, tweet in batch)
+    assert completion <= batcher.completion_budget
+
+
+def test_pack_respects_prompt_budget():
+    batcher = TokenBudgetBatcher(max_completion_tokens=100000, prompt_budget=2000)
+    batch = batcher.pack(tweets(50, text='x' * 1000))
+    prompt = batcher.prompt_overhead_tokens + sum(batcher.estimate_prompt_tokens(tweet) for _, tweet in batch)
+    assert prompt <= batcher.prompt_budget
+
+
+def test_pack_always_returns_one_oversized_tweet():
+    batcher = TokenBudgetBatcher(prompt_budget=10)
+    assert len(batcher.pack(tweets(3, text='x' * 10000))) == 1
+    assert batcher.pack([]) == []
+
+
+def test_truncation_shrinks_budget_down_to_the_floor_and_success_recovers():
+    batcher = TokenBudgetBatcher(max_completion_tokens=2000, min_completion_budget=400)
+    before = len(batcher.pack(tweets(100)))
+    batcher.record_truncation()
+    assert batcher.completion_budget == 1500
+    assert len(batcher.pack(tweets(100))) < before
+    for _ in range(20):
+        batcher.record_truncation()
+    assert batcher.completion_budget == 400
+    for _ in range(100):
+        batcher.record_success()
+    assert batcher.completion_budget == 2000
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from triggers import WorkTrigger
+
+
+def test_wait_debounces_bursts_into_one_wakeup(tmp_path):
+    trigger = WorkTrigger(str(tmp_path), debounce_seconds=0.1, max_delay=1)
+    assert trigger.wait(timeout=0.01) == set()
+    trigger.notify('screenshots')
+    trigger.notify('tweets')
+    assert trigger.wait(timeout=1) == {'screenshots', 'tweets'}
+    assert trigger.wait(timeout=0.01) == set()
+
+
+def test_notify_racing_wait_never_breaks_it(tmp_path):
+    trigger = WorkTrigger(str(tmp_path), debounce_seconds=0, max_delay=0)
+    stop = threading.Event()
+    errors = []
+
+    def notify():
+        try:
+            while not stop.is_set():
+                trigger.notify('tweets')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=notify) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    results = []
+    try:
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            results.append(trigger.wait(timeout=0.01))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert results
+    assert all(result in ({'tweets'}, set()) for result in results)
+    assert {'tweets'} in results
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+from database import SharedConnection, migrate
+
+
+class ScriptedClient:
+    """Answers analysis prompts, dropping or failing on chosen tweet IDs"""
+
+    def __init__(self, poison=(), skip_once=(), fail_requests=0):
+        self.poison = set(poison)
+        self.skip_once = set(skip_once)
+        self.fail_requests = fail_requests
+        self.requests = []
+
+    def usage_stats(self):
+        return {'llm_requests': 0, 'retries': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    async def chat_completion(self, messages, **kwargs):
+        ids = [tweet['id'] for tweet in json.loads(messages[1]['content'].split('Tweets to analyze:')[1])]
+        self.requests.append(ids)
+        if self.fail_requests:
+            self.fail_requests -= 1
+            return None
+        if self.poison & set(ids):
+            content = 'not json'
+        else:
+            analyses = [{'id': i, 'summary': f"summary {i}", 'sentiment': 'neutral', 'category': 'news'}
+                        for i in ids if i not in self.skip_once]
+            self.skip_once -= set(ids)
+            content = json.dumps({'analyses': analyses})
+        return {'choices': [{'finish_reason': 'stop', 'message': {'content': content}}]}
+
+
+@pytest.fixture
+def make_analyzer(tmp_path, monkeypatch):
+    # The module logs to a file in the working directory
+    monkeypatch.chdir(tmp_path)
+    from tweet_analyzer import TweetAnalyzer
+    path = str(tmp_path / 'twitter_data.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO tweets (tweet_id, author, text, timestamp, url) VALUES (?, ?, ?, ?, ?)',
+                     [(str(i), 'author', f"distinct tweet {i} " + 'word ' * i, '2024-01-01T00:00:00', '')
+                      for i in range(8)])
+    conn.commit()
+    conn.close()
+    dbs = []
+
+    def make(client):
+        db = SharedConnection(path)
+        dbs.append(db)
+        return TweetAnalyzer(client=client, db=db, worker_id='worker-1')
+
+    yield make
+    for db in dbs:
+        db.close()
+
+
+def batch(*ids):
+    return [(str(i), {'id': str(i), 'text': f"tweet {i}", 'author': 'a', 'timestamp': '2024-01-01'}) for i in ids]
+
+
+def test_reconcile_keeps_complete_requested_results(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient())
+    results, missing = analyzer.reconcile(batch(1, 2, 3), [
+        {'id': 1, 'summary': 's', 'sentiment': 'happy', 'category': 'news'},
+        {'id': '2', 'summary': '', 'sentiment': 'happy', 'category': 'news'},
+        {'id': '9', 'summary': 's', 'sentiment': 'happy', 'category': 'news'},
+        {'id': '1', 'summary': 'duplicate', 'sentiment': 'sad', 'category': 'news'},
+        'garbage',
+    ])
+    assert results == [{'id': '1', 'summary': 's', 'sentiment': 'happy', 'category': 'news'}]
+    assert [tweet_id for tweet_id, _ in missing] == ['2', '3']
+
+
+def test_bisection_isolates_poison_tweet(make_analyzer):
+    client = ScriptedClient(poison={'3'})
+    analyzer = make_analyzer(client)
+    results, dead, deferred = asyncio.run(analyzer.analyze_with_bisection(batch(0, 1, 2, 3, 4, 5)))
+    assert sorted(result['id'] for result in results) == ['0', '1', '2', '4', '5']
+    assert [tweet_id for tweet_id, _ in dead] == ['3']
+    assert deferred == []
+
+
+def test_partial_response_only_rerequests_missing(make_analyzer):
+    client = ScriptedClient(skip_once={'2'})
+    analyzer = make_analyzer(client)
+    results, dead, deferred = asyncio.run(analyzer.analyze_with_bisection(batch(1, 2, 3)))
+    assert sorted(result['id'] for result in results) == ['1', '2', '3']
+    assert client.requests == [['1', '2', '3'], ['2']]
+    assert analyzer.rerequests == 1
+
+
+def test_failed_request_defers_whole_batch(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient(fail_requests=1))
+    results, dead, deferred = asyncio.run(analyzer.analyze_with_bisection(batch(1, 2)))
+    assert (results, dead) == ([], [])
+    assert [tweet_id for tweet_id, _ in deferred] == ['1', '2']
+
+
+def test_dead_letter_after_max_attempts(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient())
+    for _ in range(analyzer.MAX_ANALYSIS_ATTEMPTS):
+        analyzer.record_failed_attempts([('1', 'bad output')])
+    with analyzer.db.transaction() as cursor:
+        cursor.execute("SELECT analysis_attempts, analysis_failed, last_error FROM tweets WHERE tweet_id = '1'")
+        assert tuple(cursor.fetchone()) == (3, 1, 'bad output')
+
+
+def test_save_analysis_counts_only_newly_processed(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient())
+    results = {'analyses': [{'id': '1', 'summary': 's', 'sentiment': 'happy', 'category': 'news'}]}
+    assert analyzer.save_analysis(results) == 1
+    assert analyzer.save_analysis(results) == 0
+
+
+def fail_writes(analyzer):
+    with analyzer.db.transaction() as cursor:
+        cursor.execute('''
+            CREATE TRIGGER fail_analysis_writes BEFORE UPDATE OF summary ON tweets
+            BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END
+        ''')
+
+
+def test_failed_save_is_not_counted_or_cached(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient())
+    fail_writes(analyzer)
+    assert analyzer.save_analysis({'analyses': [
+        {'id': '1', 'summary': 's', 'sentiment': 'happy', 'category': 'news'}]}) == 0
+
+    claimed = analyzer.get_unprocessed_tweets()
+    assert asyncio.run(analyzer.process_batch(claimed)) == 0
+    with analyzer.db.transaction() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM tweets WHERE processed')
+        assert cursor.fetchone()[0] == 0
+        cursor.execute('SELECT COUNT(*) FROM tweets WHERE claimed_by IS NOT NULL')
+        assert cursor.fetchone()[0] == 0
+    cached, uncached = analyzer.cache.lookup(claimed)
+    assert cached == [] and len(uncached) == len(claimed)
+
+
+def test_process_batch_analyzes_claimed_tweets_and_releases_them(make_analyzer):
+    client = ScriptedClient()
+    analyzer = make_analyzer(client)
+    claimed = analyzer.get_unprocessed_tweets()
+    assert len(claimed) == 8
+    assert analyzer.get_unprocessed_tweets() == []
+    assert asyncio.run(analyzer.process_batch(claimed)) == 8
+    with analyzer.db.transaction() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM tweets WHERE processed AND claimed_by IS NULL')
+        assert cursor.fetchone()[0] == 8
+
+
+def test_leases_are_renewed_while_a_batch_is_in_flight(make_analyzer):
+    analyzer = make_analyzer(ScriptedClient())
+    analyzer.LEASE_SECONDS = 0.3
+    analyzer.LEASE_RENEW_INTERVAL = 0.1
+    claimed = analyzer.get_unprocessed_tweets()
+
+    async def hold():
+        heartbeat = asyncio.create_task(analyzer.keep_claims([tweet_id for tweet_id, _ in claimed]))
+        await asyncio.sleep(0.6)
+        heartbeat.cancel()
+
+    asyncio.run(hold())
+    with analyzer.db.transaction() as cursor:
+        cursor.execute('SELECT MIN(lease_expires_at) FROM tweets')
+        assert cursor.fetchone()[0] > time.time()
+
+
+class SlowClient(ScriptedClient):
+    """Scripted answers after a delay, recording how many requests overlap"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def chat_completion(self, messages, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            return await super().chat_completion(messages, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def test_process_tweets_keeps_several_batches_in_flight(make_analyzer):
+    client = SlowClient()
+    analyzer = make_analyzer(client)
+    analyzer.BATCH_SIZE = 2
+    analyzer.MAX_CONCURRENT_BATCHES = 3
+    asyncio.run(analyzer.process_tweets())
+
+    assert client.max_in_flight == 3
+    assert sorted(tweet_id for ids in client.requests for tweet_id in ids) == [str(i) for i in range(8)]
+    assert analyzer.total_processed == 8
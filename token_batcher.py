@@ -0,0 +1,69 @@
+import json
+import logging
+
+# Rough OpenAI tokenizer ratio for English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimate the token count of a string"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class TokenBudgetBatcher:
+    """Packs tweets into batches that fit a prompt and completion token budget.
+
+    The completion budget starts at ``max_completion_tokens`` and shrinks
+    whenever a response is cut off (``finish_reason == "length"``), then
+    recovers slowly while responses fit.
+    """
+
+    def __init__(self, max_completion_tokens=2000, prompt_budget=8000,
+                 prompt_overhead_tokens=400, result_overhead_tokens=40,
+                 max_summary_tokens=70, completion_overhead_tokens=20,
+                 min_completion_budget=400, shrink_factor=0.75, growth_factor=1.05):
+        self.max_completion_tokens = max_completion_tokens
+        self.prompt_budget = prompt_budget
+        self.prompt_overhead_tokens = prompt_overhead_tokens
+        self.result_overhead_tokens = result_overhead_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.completion_overhead_tokens = completion_overhead_tokens
+        self.min_completion_budget = min_completion_budget
+        self.shrink_factor = shrink_factor
+        self.growth_factor = growth_factor
+        self.completion_budget = max_completion_tokens
+
+    def estimate_prompt_tokens(self, tweet):
+        """Tokens a tweet adds to the prompt, as serialized in the request"""
+        return estimate_tokens(json.dumps(tweet, indent=2, default=str))
+
+    def estimate_completion_tokens(self, tweet):
+        """Tokens the model is expected to spend on a tweet's analysis"""
+        # Summaries are capped at 50 words but rarely longer than the tweet itself
+        summary_tokens = min(self.max_summary_tokens, estimate_tokens(tweet.get('text') or '') + 10)
+        return self.result_overhead_tokens + estimate_tokens(str(tweet.get('id', ''))) + summary_tokens
+
+    def pack(self, tweets):
+        """Take the longest prefix of tweets that fits both budgets (at least one tweet)"""
+        prompt_tokens = self.prompt_overhead_tokens
+        completion_tokens = self.completion_overhead_tokens
+        batch = []
+        for tweet_id, tweet in tweets:
+            prompt_tokens += self.estimate_prompt_tokens(tweet)
+            completion_tokens += self.estimate_completion_tokens(tweet)
+            if batch and (prompt_tokens > self.prompt_budget or
+                          completion_tokens > self.completion_budget):
+                break
+            batch.append((tweet_id, tweet))
+        return batch
+
+    def record_truncation(self):
+        """Shrink the completion budget after a response hit max_tokens"""
+        self.completion_budget = max(self.min_completion_budget,
+                                     int(self.completion_budget * self.shrink_factor))
+        logging.warning(f"Response truncated, completion budget reduced to {self.completion_budget} tokens")
+
+    def record_success(self):
+        """Grow the completion budget back towards max_completion_tokens"""
+        self.completion_budget = min(self.max_completion_tokens,
+                                     int(self.completion_budget * self.growth_factor) + 1)
@@ -0,0 +1,167 @@
+import glob
+import logging
+import os
+import threading
+import time
+from database import connect_readonly
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    # Without watchdog the screenshots directory is polled like the database
+    FileSystemEventHandler = object
+    Observer = None
+
+SCREENSHOT_PATTERN = "timeline_*.png"
+
+
+class ScreenshotHandler(FileSystemEventHandler):
+    """Forwards new or renamed-in timeline screenshots to a WorkTrigger"""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+
+    def on_created(self, event):
+        self.check(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self.check(event.dest_path, event.is_directory)
+
+    def check(self, path, is_directory):
+        name = os.path.basename(path)
+        if not is_directory and name.startswith('timeline_') and name.endswith('.png'):
+            self.trigger.notify('screenshots')
+
+
+class WorkTrigger:
+    """Signals new pipeline work: screenshots landing on disk and unprocessed tweets in the database.
+
+    The screenshots directory is watched through watchdog (inotify on Linux)
+    when it is installed and polled otherwise; the tweets table is polled for
+    unprocessed rows above the highest rowid seen so far. Bursts are
+    debounced: ``wait`` returns once nothing new has arrived for
+    ``debounce_seconds``, or ``max_delay`` seconds after the first change.
+    """
+
+    def __init__(self, screenshots_dir="screenshots", db_file="twitter_data.db",
+                 poll_interval=5, debounce_seconds=10, max_delay=60):
+        self.SCREENSHOTS_DIR = screenshots_dir
+        self.DB_FILE = db_file
+        self.poll_interval = poll_interval
+        self.debounce_seconds = debounce_seconds
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.pending = set()
+        self.first_change = None
+        self.last_change = None
+        self.observer = None
+        self.poller = None
+        self.screenshots = set()
+        self.last_rowid = 0
+
+    def start(self):
+        """Start watching from the current state, so only later arrivals trigger"""
+        os.makedirs(self.SCREENSHOTS_DIR, exist_ok=True)
+        self.screenshots = self.list_screenshots()
+        self.last_rowid = self.max_tweet_rowid()
+
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(ScreenshotHandler(self), self.SCREENSHOTS_DIR, recursive=False)
+            self.observer.start()
+            logging.info(f"Watching {self.SCREENSHOTS_DIR} for new screenshots")
+        else:
+            logging.info(f"watchdog is not installed, polling {self.SCREENSHOTS_DIR} "
+                         f"every {self.poll_interval}s")
+
+        self.poller = threading.Thread(target=self.poll, name='work-trigger', daemon=True)
+        self.poller.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.changed.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(timeout=5)
+            self.observer = None
+
+    def notify(self, kind):
+        """Record new work of a kind ('screenshots' or 'tweets')"""
+        now = time.monotonic()
+        with self.lock:
+            self.pending.add(kind)
+            self.last_change = now
+            if self.first_change is None:
+                self.first_change = now
+            # Set under the lock so wait() never sees the event without a change to time
+            self.changed.set()
+
+    def wait(self, timeout=None):
+        """Block until debounced work arrives or timeout passes; returns the kinds of work, or an empty set"""
+        if not self.changed.wait(timeout) or self.stopped.is_set():
+            return set()
+
+        while not self.stopped.is_set():
+            with self.lock:
+                if self.last_change is None:
+                    break
+                ready_at = min(self.last_change + self.debounce_seconds,
+                               self.first_change + self.max_delay)
+            remaining = ready_at - time.monotonic()
+            if remaining <= 0:
+                break
+            self.stopped.wait(remaining)
+
+        with self.lock:
+            kinds, self.pending = self.pending, set()
+            self.first_change = self.last_change = None
+            self.changed.clear()
+        return kinds
+
+    def list_screenshots(self):
+        return set(glob.glob(os.path.join(self.SCREENSHOTS_DIR, SCREENSHOT_PATTERN)))
+
+    def max_tweet_rowid(self):
+        conn = connect_readonly(self.DB_FILE)
+        try:
+            return conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM tweets').fetchone()[0]
+        finally:
+            conn.close()
+
+    def new_unprocessed_tweets(self):
+        """Whether tweets waiting for analysis were inserted since the last check"""
+        conn = connect_readonly(self.DB_FILE)
+        try:
+            # Both lookups walk the rowid b-tree from the last position seen, not the whole table
+            max_rowid = conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM tweets').fetchone()[0]
+            if max_rowid <= self.last_rowid:
+                return False
+            found = conn.execute('''
+                SELECT EXISTS (
+                    SELECT 1 FROM tweets
+                    WHERE rowid > ?
+                      AND (processed IS FALSE OR processed IS NULL)
+                      AND (analysis_failed IS FALSE OR analysis_failed IS NULL)
+                )
+            ''', (self.last_rowid,)).fetchone()[0]
+            self.last_rowid = max_rowid
+            return bool(found)
+        finally:
+            conn.close()
+
+    def poll(self):
+        """Check the database, and the screenshots directory without watchdog, until stopped"""
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                if self.observer is None:
+                    screenshots = self.list_screenshots()
+                    if screenshots - self.screenshots:
+                        self.notify('screenshots')
+                    self.screenshots = screenshots
+                if self.new_unprocessed_tweets():
+                    self.notify('tweets')
+            except Exception as e:
+                logging.error(f"Error checking for new pipeline work: {e}")
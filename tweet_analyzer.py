@@ -1,11 +1,18 @@
-import sqlite3
 import json
 import os
 import logging
 import pytz
 from datetime import datetime
-import aiohttp
 import asyncio
+import time
+import socket
+import argparse
+from llm_client import LLMClient
+from database import migrate, update_rollups, bump_data_version, SharedConnection
+from analysis_cache import AnalysisCache
+from near_duplicates import NearDuplicateClusterer
+from token_batcher import TokenBudgetBatcher
+from telemetry import record_stage_usage, stage_name
 
 # Set up logging
 logging.basicConfig(
@@ -18,91 +25,122 @@ logging.basicConfig(
 )
 
 class TweetAnalyzer:
-    def __init__(self):
+    def __init__(self, max_concurrent_batches=4, client=None, cache=None, worker_id=None, db=None):
         self.DB_FILE = "twitter_data.db"
-        self.API_KEY_FILE = "openai_key.txt"
-        self.BATCH_SIZE = 25
-        self.api_key = self.get_api_key()
-        self.init_database()
-
-    def get_api_key(self):
-        """Get OpenAI API key from file or user input"""
-        if os.path.exists(self.API_KEY_FILE):
-            try:
-                with open(self.API_KEY_FILE, 'r') as f:
-                    key = f.read().strip()
-                if key:
-                    logging.info("API key loaded from file")
-                    return key
-            except Exception as e:
-                logging.error(f"Error reading API key file: {e}")
-        
-        print("\nOpenAI API key not found or invalid.")
-        key = input("Please enter your OpenAI API key: ").strip()
-        
-        try:
-            with open(self.API_KEY_FILE, 'w') as f:
-                f.write(key)
-            logging.info("API key saved to file")
-        except Exception as e:
-            logging.error(f"Error saving API key: {e}")
-        
-        return key
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        # Seconds a claimed batch stays reserved before other workers may reclaim it;
+        # renewed every LEASE_RENEW_INTERVAL while the batch is being analyzed
+        self.LEASE_SECONDS = 600
+        self.LEASE_RENEW_INTERVAL = self.LEASE_SECONDS / 3
+        # Upper bound on tweets per request; the batcher packs as many as fit the token budget
+        self.BATCH_SIZE = 50
+        self.MAX_COMPLETION_TOKENS = 2000
+        self.batcher = TokenBudgetBatcher(max_completion_tokens=self.MAX_COMPLETION_TOKENS)
+        self.MAX_CONCURRENT_BATCHES = max_concurrent_batches
+        self.FAILED_BATCH_DELAY = 1
+        # Failed single-tweet analyses before a tweet is moved to the dead-letter state
+        self.MAX_ANALYSIS_ATTEMPTS = 3
+        # Give up on the run after this many batches in a row fail at the request level
+        self.MAX_CONSECUTIVE_REQUEST_FAILURES = 5
+        self.consecutive_request_failures = 0
+        # Run counters reported to pipeline_runs
+        self.total_processed = 0
+        self.failed_tweets = 0
+        self.rerequests = 0
+        # Max SimHash bit distance for two tweets to share one analysis
+        self.NEAR_DUPLICATE_MAX_DISTANCE = 3
+        # Representatives remembered for label reuse before the least recently matched are evicted
+        self.NEAR_DUPLICATE_MAX_ENTRIES = 50000
+        # Tweets with fewer normalized tokens (emoji, links, handles alone) are never clustered
+        self.NEAR_DUPLICATE_MIN_TOKENS = 4
+        self.client = client or LLMClient()
+        # Counters before this run, since the orchestrator shares one client across stages
+        self.usage_baseline = self.client.usage_stats()
+        # A shared connection comes from the orchestrator, which migrates once at startup
+        if db is None:
+            self.init_database()
+        # One connection reused for every batch instead of a connect per call
+        self.db = db or SharedConnection(self.DB_FILE)
+        self.cache = cache or AnalysisCache(self.DB_FILE, db=self.db)
+        self.clusterer = NearDuplicateClusterer(max_distance=self.NEAR_DUPLICATE_MAX_DISTANCE,
+                                                max_entries=self.NEAR_DUPLICATE_MAX_ENTRIES,
+                                                min_tokens=self.NEAR_DUPLICATE_MIN_TOKENS)
 
     def init_database(self):
-        """Initialize database with new fields if they don't exist"""
-        conn = sqlite3.connect(self.DB_FILE)
-        cursor = conn.cursor()
-
-        # Get existing columns in tweets table
-        cursor.execute("PRAGMA table_info(tweets)")
-        existing_columns = {col[1] for col in cursor.fetchall()}
-
-        # Add new columns if they don't exist
-        new_columns = {
-            'processed': 'BOOLEAN DEFAULT FALSE',
-            'processed_at': 'DATETIME',
-            'summary': 'TEXT',
-            'sentiment': 'TEXT',
-            'category': 'TEXT'
-        }
-
-        for column, data_type in new_columns.items():
-            if column not in existing_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE tweets ADD COLUMN {column} {data_type}")
-                    logging.info(f"Added new column: {column}")
-                except sqlite3.OperationalError as e:
-                    logging.warning(f"Column {column} already exists or error: {e}")
-
-        conn.commit()
-        conn.close()
-        logging.info("Database initialization completed")
+        """Bring the database schema up to date"""
+        migrate(self.DB_FILE)
 
     def get_unprocessed_tweets(self):
-        """Get batch of unprocessed tweets"""
-        conn = sqlite3.connect(self.DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT tweet_id, text, author, timestamp
-            FROM tweets
-            WHERE processed IS FALSE OR processed IS NULL
-            LIMIT ?
-        ''', (self.BATCH_SIZE,))
-        
-        tweets = cursor.fetchall()
-        conn.close()
+        """Atomically claim a token-budgeted batch of unprocessed tweets for this worker.
+
+        Rows leased by another worker are skipped until their lease expires,
+        so batches held by a crashed worker are picked up again automatically.
+        """
+        # BEGIN IMMEDIATE takes the write lock up front so no other worker can claim the same rows
+        with self.db.transaction() as cursor:
+            now = time.time()
+            cursor.execute('''
+                SELECT tweet_id, text, author, timestamp
+                FROM tweets
+                WHERE (processed IS FALSE OR processed IS NULL)
+                  AND (analysis_failed IS FALSE OR analysis_failed IS NULL)
+                  AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                LIMIT ?
+            ''', (now, self.BATCH_SIZE))
+            
+            batch = self.batcher.pack([(tweet[0], {
+                'id': tweet[0],
+                'text': tweet[1],
+                'author': tweet[2],
+                'timestamp': tweet[3]
+            }) for tweet in cursor.fetchall()])
+            
+            cursor.executemany('''
+                UPDATE tweets
+                SET claimed_by = ?, lease_expires_at = ?
+                WHERE tweet_id = ?
+            ''', [(self.worker_id, now + self.LEASE_SECONDS, tweet_id) for tweet_id, _ in batch])
         
-        return [(tweet[0], {
-            'id': tweet[0],
-            'text': tweet[1],
-            'author': tweet[2],
-            'timestamp': tweet[3]
-        }) for tweet in tweets]
+        return batch
+
+    def renew_claims(self, tweet_ids):
+        """Extend this worker's leases on the given tweets; rows lost to another worker stay theirs"""
+        try:
+            with self.db.transaction() as cursor:
+                lease_expires_at = time.time() + self.LEASE_SECONDS
+                cursor.executemany('''
+                    UPDATE tweets
+                    SET lease_expires_at = ?
+                    WHERE tweet_id = ? AND claimed_by = ?
+                ''', [(lease_expires_at, tweet_id, self.worker_id) for tweet_id in tweet_ids])
+        except Exception as e:
+            logging.error(f"Error renewing claimed tweets: {e}")
+
+    async def keep_claims(self, tweet_ids):
+        """Renew leases until cancelled, so bisection, retries and backoff never outlive them"""
+        while True:
+            await asyncio.sleep(self.LEASE_RENEW_INTERVAL)
+            await asyncio.to_thread(self.renew_claims, tweet_ids)
+
+    def release_claims(self, tweet_ids):
+        """Release this worker's leases on the given tweets"""
+        try:
+            with self.db.transaction() as cursor:
+                cursor.executemany('''
+                    UPDATE tweets
+                    SET claimed_by = NULL, lease_expires_at = NULL
+                    WHERE tweet_id = ? AND claimed_by = ?
+                ''', [(tweet_id, self.worker_id) for tweet_id in tweet_ids])
+        except Exception as e:
+            logging.error(f"Error releasing claimed tweets: {e}")
 
     async def analyze_tweets(self, tweets):
-        """Analyze batch of tweets using GPT-4"""
+        """Analyze batch of tweets using GPT-4.
+
+        Returns None when the request itself failed, or a dict whose
+        "analyses" list is empty and "error" is set when the model answered
+        with an unusable response.
+        """
         tweets_data = []
         for _, tweet in tweets:
             tweets_data.append({
@@ -137,73 +175,89 @@ class TweetAnalyzer:
         """
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
+            result = await self.client.chat_completion(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a tweet analysis system. Return only valid JSON matching the specified format exactly."
                     },
-                    json={
-                        "model": "gpt-4o-mini",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are a tweet analysis system. Return only valid JSON matching the specified format exactly."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "max_tokens": 2000,
-                        "response_format": { "type": "json_object" }
+                    {
+                        "role": "user",
+                        "content": prompt
                     }
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result['choices'][0]['message']['content']
-                        
-                        # Log the raw response for debugging
-                        logging.info(f"Raw GPT response: {content}")
-                        
-                        # Parse and validate the response
-                        try:
-                            parsed_content = json.loads(content)
-                            if 'analyses' not in parsed_content:
-                                logging.error("Response missing 'analyses' array")
-                                return None
-                            return parsed_content
-                        except json.JSONDecodeError as e:
-                            logging.error(f"Failed to parse GPT response as JSON: {e}")
-                            return None
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"OpenAI API error: {error_text}")
-                        return None
+                ],
+                max_tokens=self.MAX_COMPLETION_TOKENS,
+                response_format={ "type": "json_object" }
+            )
+            if not result:
+                return None
+            
+            choice = result['choices'][0]
+            if choice.get('finish_reason') == 'length':
+                logging.error(f"Response for {len(tweets)} tweets was truncated at max_tokens")
+                self.batcher.record_truncation()
+                return {'analyses': [], 'error': "Response truncated at max_tokens"}
+            self.batcher.record_success()
+            
+            content = choice['message']['content']
+            
+            # Log the raw response for debugging
+            logging.info(f"Raw GPT response: {content}")
+            
+            # Parse and validate the response
+            try:
+                parsed_content = json.loads(content)
+                if not isinstance(parsed_content, dict) or not isinstance(parsed_content.get('analyses'), list):
+                    logging.error("Response missing 'analyses' array")
+                    return {'analyses': [], 'error': "Response missing 'analyses' array"}
+                return parsed_content
+            except json.JSONDecodeError as e:
+                logging.error(f"Failed to parse GPT response as JSON: {e}")
+                return {'analyses': [], 'error': f"Invalid JSON: {e}"}
         except Exception as e:
             logging.error(f"Error analyzing tweets: {e}")
             return None
 
     def save_analysis(self, analysis_results):
-        """Save analysis results to database"""
+        """Save analysis results to database in a single bulk transaction.
+
+        Returns the number of tweets marked processed, which is 0 when the
+        transaction failed and was rolled back.
+        """
         if not analysis_results or 'analyses' not in analysis_results:
             logging.error("Invalid analysis results format")
-            return
+            return 0
 
-        conn = sqlite3.connect(self.DB_FILE)
-        cursor = conn.cursor()
         current_time = datetime.now(pytz.UTC).isoformat()
+        rows = []
+        for result in analysis_results['analyses']:
+            if not all(key in result for key in ['id', 'summary', 'sentiment', 'category']):
+                logging.warning(f"Skipping incomplete result: {result}")
+                continue
+            rows.append((
+                current_time,
+                result['summary'],
+                result['sentiment'],
+                result['category'],
+                result['id']
+            ))
+
+        if not rows:
+            return 0
 
         try:
-            for result in analysis_results['analyses']:
-                logging.info(f"Processing result for tweet {result.get('id', 'unknown')}")
-                
-                if not all(key in result for key in ['id', 'summary', 'sentiment', 'category']):
-                    logging.warning(f"Skipping incomplete result: {result}")
-                    continue
+            with self.db.transaction() as cursor:
+                # Only the first analysis of a tweet counts, e.g. after a lease expired mid-batch
+                tweet_ids = [row[-1] for row in rows]
+                placeholders = ','.join('?' * len(tweet_ids))
+                cursor.execute(f'''
+                    SELECT tweet_id FROM tweets
+                    WHERE tweet_id IN ({placeholders})
+                      AND (processed IS FALSE OR processed IS NULL)
+                ''', tweet_ids)
+                newly_processed = [row[0] for row in cursor.fetchall()]
 
-                cursor.execute('''
+                cursor.executemany('''
                     UPDATE tweets
                     SET processed = TRUE,
                         processed_at = ?,
@@ -211,55 +265,221 @@ class TweetAnalyzer:
                         sentiment = ?,
                         category = ?
                     WHERE tweet_id = ?
-                ''', (
-                    current_time,
-                    result['summary'],
-                    result['sentiment'],
-                    result['category'],
-                    result['id']
-                ))
-            
-            conn.commit()
-            logging.info(f"Successfully saved analysis for {len(analysis_results['analyses'])} tweets")
+                      AND (processed IS FALSE OR processed IS NULL)
+                ''', rows)
+
+                # Keep the timeline rollups in step with the tweets table
+                update_rollups(cursor, newly_processed)
+                if newly_processed:
+                    bump_data_version(cursor)
+            logging.info(f"Successfully saved analysis for {len(newly_processed)} tweets")
+            return len(newly_processed)
             
         except Exception as e:
             logging.error(f"Error saving analysis results: {e}")
-            conn.rollback()
+            return 0
+
+    def reconcile(self, tweets, analyses):
+        """Match model results to the requested tweets.
+
+        Returns the complete results for tweets in the batch and the tweets
+        the model left out or answered incompletely.
+        """
+        requested = {str(tweet_id): tweet_id for tweet_id, _ in tweets}
+        results = {}
+        for result in analyses:
+            if not isinstance(result, dict):
+                continue
+            key = str(result.get('id'))
+            if key not in requested or key in results:
+                continue
+            if not all(result.get(field) for field in ['summary', 'sentiment', 'category']):
+                continue
+            results[key] = {
+                'id': requested[key],
+                'summary': result['summary'],
+                'sentiment': result['sentiment'],
+                'category': result['category']
+            }
+
+        missing = [(tweet_id, tweet) for tweet_id, tweet in tweets if str(tweet_id) not in results]
+        return list(results.values()), missing
+
+    async def analyze_with_bisection(self, tweets):
+        """Analyze tweets, salvaging partial results and bisecting failing batches.
+
+        Returns ``(results, dead, deferred)``: complete results, tweet IDs
+        with the error that isolated them as poison, and tweets left for a
+        later retry because the request itself failed.
+        """
+        analysis_results = await self.analyze_tweets(tweets)
+        if analysis_results is None:
+            return [], [], tweets
+
+        results, missing = self.reconcile(tweets, analysis_results.get('analyses', []))
+        if not missing:
+            return results, [], []
+
+        if results:
+            # Keep what came back and only re-request the tweets the model skipped
+            logging.warning(f"Salvaged {len(results)} results, re-queueing {len(missing)} missing tweets")
+            self.rerequests += 1
+            more, dead, deferred = await self.analyze_with_bisection(missing)
+            return results + more, dead, deferred
+
+        if len(tweets) == 1:
+            error = analysis_results.get('error') or "Model returned no usable result"
+            logging.error(f"Isolated failing tweet {tweets[0][0]}: {error}")
+            return [], [(tweets[0][0], error)], []
+
+        mid = len(tweets) // 2
+        logging.warning(f"Batch of {len(tweets)} tweets failed, splitting into {mid} and {len(tweets) - mid}")
+        self.rerequests += 2
+        halves = await asyncio.gather(
+            self.analyze_with_bisection(tweets[:mid]),
+            self.analyze_with_bisection(tweets[mid:])
+        )
+        return (halves[0][0] + halves[1][0],
+                halves[0][1] + halves[1][1],
+                halves[0][2] + halves[1][2])
+
+    def record_failed_attempts(self, failures):
+        """Count a failed attempt per tweet, dead-lettering tweets that hit MAX_ANALYSIS_ATTEMPTS"""
+        try:
+            with self.db.transaction() as cursor:
+                cursor.executemany('''
+                    UPDATE tweets
+                    SET analysis_attempts = COALESCE(analysis_attempts, 0) + 1,
+                        analysis_failed = (COALESCE(analysis_attempts, 0) + 1 >= ?),
+                        last_error = ?
+                    WHERE tweet_id = ?
+                ''', [(self.MAX_ANALYSIS_ATTEMPTS, error, tweet_id) for tweet_id, error in failures])
+            logging.warning(f"Recorded failed analysis attempts for {len(failures)} tweets")
+        except Exception as e:
+            logging.error(f"Error recording failed analysis attempts: {e}")
+
+    async def process_batch(self, tweets):
+        """Analyze and save a single batch, returning the number of tweets processed"""
+        tweet_ids = [tweet_id for tweet_id, _ in tweets]
+        heartbeat = asyncio.create_task(self.keep_claims(tweet_ids))
+        try:
+            # Tweets whose text was analyzed before are saved without an API call
+            cached_results, tweets = await asyncio.to_thread(self.cache.lookup, tweets)
+            saved = 0
+            if cached_results:
+                written = await asyncio.to_thread(self.save_analysis, {'analyses': cached_results})
+                logging.info(f"Saved {written} tweets from the analysis cache")
+                saved += written
+            if not tweets:
+                return saved
+
+            # Near-duplicates of an analyzed tweet reuse its labels
+            copied_results, representatives, followers = self.clusterer.cluster(tweets)
+            if copied_results:
+                written = await asyncio.to_thread(self.save_analysis, {'analyses': copied_results})
+                logging.info(f"Copied labels to {written} near-duplicate tweets")
+                saved += written
+            if not representatives:
+                return saved
+
+            results, dead, deferred = await self.analyze_with_bisection(representatives)
+            if not deferred:
+                self.consecutive_request_failures = 0
+            if results:
+                member_results = self.clusterer.propagate(results, followers)
+                written = await asyncio.to_thread(self.save_analysis, {'analyses': results + member_results})
+                # Only labels that reached the tweets table are cached for reuse
+                if written:
+                    await asyncio.to_thread(self.cache.store, representatives, results)
+                saved += written
+            self.failed_tweets += len(dead) + len(deferred)
+            if dead:
+                await asyncio.to_thread(self.record_failed_attempts, dead)
+            if deferred:
+                self.consecutive_request_failures += 1
+                logging.error(f"Failed to analyze {len(deferred)} tweets, will retry...")
+                # Back off before the tweets become eligible for selection again
+                await asyncio.sleep(self.FAILED_BATCH_DELAY)
+            return saved
         finally:
-            conn.close()
+            heartbeat.cancel()
+            await asyncio.to_thread(self.release_claims, tweet_ids)
+
+    def log_throughput(self, total_processed, start_time):
+        """Log overall throughput in tweets per second"""
+        elapsed = time.monotonic() - start_time
+        rate = total_processed / elapsed if elapsed > 0 else 0.0
+        logging.info(f"Total tweets processed: {total_processed} in {elapsed:.1f}s "
+                     f"({rate:.2f} tweets/sec, {self.MAX_CONCURRENT_BATCHES} batches in flight)")
 
     async def process_tweets(self):
-        """Main processing function"""
+        """Main processing function, keeping up to MAX_CONCURRENT_BATCHES batches in flight"""
         total_processed = 0
+        pending = set()
+        start_time = time.monotonic()
         
         while True:
-            # Get batch of unprocessed tweets
-            tweets = self.get_unprocessed_tweets()
-            if not tweets:
+            # Top up the pipeline while earlier requests are still outstanding
+            while len(pending) < self.MAX_CONCURRENT_BATCHES:
+                if self.consecutive_request_failures >= self.MAX_CONSECUTIVE_REQUEST_FAILURES:
+                    logging.error("Too many consecutive API request failures, stopping this run")
+                    break
+                tweets = await asyncio.to_thread(self.get_unprocessed_tweets)
+                if not tweets:
+                    break
+                
+                logging.info(f"Processing batch of {len(tweets)} tweets "
+                             f"({len(pending) + 1} batches in flight)")
+                pending.add(asyncio.create_task(self.process_batch(tweets)))
+            
+            if not pending:
                 logging.info("No more tweets to process")
                 break
-                
-            batch_size = len(tweets)
-            logging.info(f"Processing batch of {batch_size} tweets")
             
-            # Analyze tweets
-            analysis_results = await self.analyze_tweets(tweets)
-            if analysis_results:
-                # Save results
-                self.save_analysis(analysis_results)
-                total_processed += batch_size
-                logging.info(f"Completed processing batch. Total tweets processed: {total_processed}")
-            else:
-                logging.error("Failed to analyze batch, skipping...")
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    total_processed += task.result()
+                except Exception as e:
+                    logging.error(f"Error processing batch: {e}")
+            self.total_processed = total_processed
             
-            # Small delay between batches
-            await asyncio.sleep(1)
+            self.log_throughput(total_processed, start_time)
         
         logging.info(f"Processing completed. Total tweets analyzed: {total_processed}")
+        self.log_throughput(total_processed, start_time)
+        self.cache.log_stats()
+        logging.info(f"Near-duplicate clustering copied labels to {self.clusterer.copied} tweets")
+
+    def telemetry_counters(self):
+        """Counters for this worker's share of the pipeline_runs row"""
+        counters = self.client.usage_since(self.usage_baseline)
+        counters['items_processed'] = self.total_processed
+        counters['failures'] = self.failed_tweets
+        counters['retries'] += self.rerequests
+        return counters
+
+async def main(worker_id=None, concurrency=4, client=None, db=None, run_id=None):
+    """Analyze every unprocessed tweet.
 
-async def main():
-    analyzer = TweetAnalyzer()
-    await analyzer.process_tweets()
+    The in-process orchestrator passes its shared client and connection,
+    which are left open, and the id of the pipeline run.
+    """
+    analyzer = TweetAnalyzer(max_concurrent_batches=concurrency, worker_id=worker_id,
+                             client=client, db=db)
+    logging.info(f"Analyzer worker {analyzer.worker_id} started")
+    try:
+        await analyzer.process_tweets()
+    finally:
+        record_stage_usage(analyzer.db, analyzer.telemetry_counters(), run_id, stage_name(__file__))
+        if client is None:
+            await analyzer.client.close()
+        if db is None:
+            analyzer.db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Analyze unprocessed tweets")
+    parser.add_argument('--worker-id', help="Identifier used when claiming tweets (defaults to host-pid)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Batches kept in flight")
+    args = parser.parse_args()
+    asyncio.run(main(worker_id=args.worker_id, concurrency=args.concurrency))